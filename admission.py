@@ -0,0 +1,239 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """Bound concurrent validations and the bytes they hold, with a bounded FIFO queue.
+
+    A request is admitted at once when a slot and byte budget are free, queued
+    when they are not, and rejected with a Retry-After estimate when the queue is
+    full or it has waited longer than queue_timeout. A single request larger than
+    max_bytes is still admitted once nothing else is running.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_bytes: int,
+        max_queue: int,
+        queue_timeout: float,
+        initial_duration: float = 30.0
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_bytes = max_bytes
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.active_bytes = 0
+        self.waiters: Deque[Tuple[int, "asyncio.Future"]] = deque()
+        # Moving average of how long an admitted request holds its slot
+        self.average_duration = initial_duration
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # Clients that went away while queued
+        self.abandoned = 0
+
+    def _fits(self, size: int) -> bool:
+        if self.active == 0:
+            return True
+        return self.active < self.max_concurrent and self.active_bytes + size <= self.max_bytes
+
+    def _admit(self, size: int) -> None:
+        self.active += 1
+        self.active_bytes += size
+        self.admitted += 1
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request should have drained."""
+        ahead = len(self.waiters) + 1
+        return max(1, math.ceil(self.average_duration * ahead / self.max_concurrent))
+
+    def try_acquire(self, size: int) -> bool:
+        """Take a slot for a request of size bytes if one is free right now."""
+        if not self.waiters and self._fits(size):
+            self._admit(size)
+            return True
+        return False
+
+    async def acquire(self, size: int) -> None:
+        """Wait for a slot for a request of size bytes; raises AdmissionRejected."""
+        if self.try_acquire(size):
+            return
+        if len(self.waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after(), "Too many validations in progress")
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (size, future)
+        self.waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            self.timed_out += 1
+            raise AdmissionRejected(self.retry_after(), "Timed out waiting for a validation slot")
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Admitted just as the client went away: hand the slot on
+                self.release(size)
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            raise
+
+    def release(self, size: int, duration: Optional[float] = None) -> None:
+        self.active -= 1
+        self.active_bytes -= size
+        if duration is not None:
+            self.average_duration = 0.8 * self.average_duration + 0.2 * duration
+        while self.waiters and self._fits(self.waiters[0][0]):
+            waiting_size, future = self.waiters.popleft()
+            if future.done():
+                continue
+            self._admit(waiting_size)
+            future.set_result(None)
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "active_bytes": self.active_bytes,
+            "queue_depth": len(self.waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "abandoned": self.abandoned,
+            "average_duration": self.average_duration
+        }
+
+
+class _QueuedReceive:
+    """receive() for the app that first replays the messages read while the request was queued."""
+
+    def __init__(self, receive: Receive):
+        self.receive = receive
+        self.messages: Deque[Message] = deque()
+        self.pending: Optional["asyncio.Future"] = None
+        self.body_bytes = 0
+
+    async def __call__(self) -> Message:
+        if self.messages:
+            return self.messages.popleft()
+        if self.pending is not None:
+            pending, self.pending = self.pending, None
+            return await pending
+        return await self.receive()
+
+
+class AdmissionMiddleware:
+    """Admit POSTs to the given paths through an AdmissionController before the app reads the body.
+
+    The declared Content-Length is charged against the byte budget (default_bytes when
+    absent) and the slot is held until the response, including a streamed one, ends.
+    Rejected requests get 429 with Retry-After.
+
+    Servers do not cancel a request when its client disconnects, so a queued request
+    keeps reading its body to notice the disconnect and give up its place. Up to
+    max_buffered_bytes of body is held for the app meanwhile; past that, the request
+    just waits for its turn.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController,
+        paths: Iterable[str],
+        default_bytes: int,
+        max_buffered_bytes: int = 1024 * 1024
+    ):
+        self.app = app
+        self.controller = controller
+        self.paths = set(paths)
+        self.default_bytes = default_bytes
+        self.max_buffered_bytes = max_buffered_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        size = int(content_length) if content_length is not None and content_length.isdigit() else self.default_bytes
+        queued_receive = _QueuedReceive(receive)
+        if not self.controller.try_acquire(size):
+            try:
+                admitted = await self._wait(size, queued_receive)
+            except AdmissionRejected as e:
+                await self._reject(send, e)
+                return
+            if not admitted:
+                self.controller.abandoned += 1
+                return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, queued_receive, send)
+        finally:
+            self.controller.release(size, time.monotonic() - started)
+
+    async def _wait(self, size: int, queued_receive: _QueuedReceive) -> bool:
+        """Wait in the queue while watching for a disconnect; False if the client went away."""
+        acquire = asyncio.ensure_future(self.controller.acquire(size))
+        admitted = False
+        try:
+            while not acquire.done() and queued_receive.body_bytes <= self.max_buffered_bytes:
+                if queued_receive.pending is None:
+                    queued_receive.pending = asyncio.ensure_future(queued_receive.receive())
+                await asyncio.wait({acquire, queued_receive.pending}, return_when=asyncio.FIRST_COMPLETED)
+                if not queued_receive.pending.done():
+                    continue
+                message = queued_receive.pending.result()
+                queued_receive.pending = None
+                if message["type"] == "http.disconnect":
+                    return False
+                queued_receive.messages.append(message)
+                queued_receive.body_bytes += len(message.get("body", b""))
+            await acquire
+            admitted = True
+            return True
+        finally:
+            if not admitted:
+                if queued_receive.pending is not None:
+                    queued_receive.pending.cancel()
+                if not acquire.done():
+                    # acquire() hands the slot on if it was granted meanwhile
+                    acquire.cancel()
+                elif not acquire.cancelled() and acquire.exception() is None:
+                    # Admitted in the same step the client went away
+                    self.controller.release(size)
+
+    async def _reject(self, send: Send, error: AdmissionRejected) -> None:
+        body = json.dumps({"detail": error.reason, "retry_after": error.retry_after}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(error.retry_after).encode()),
+                (b"connection", b"close")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
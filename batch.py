@@ -0,0 +1,74 @@
+import json
+import posixpath
+import zipfile
+from typing import Dict, List, Optional, Union
+
+# Optional file in a zip of zips giving per-archive description/setup, keyed by member name
+MANIFEST_NAME = "manifest.json"
+# Metadata folders added by archivers, never archives to validate
+IGNORED_PREFIXES = ("__MACOSX/",)
+
+
+class BatchItem:
+    """One archive in a batch: an uploaded file or a member of an uploaded zip of zips."""
+
+    def __init__(
+        self,
+        index: int,
+        name: str,
+        upload: int,
+        description: str,
+        setup: str,
+        member: Optional[zipfile.ZipInfo] = None
+    ):
+        self.index = index
+        self.name = name
+        # Position of the upload it came from, and the nested member if any
+        self.upload = upload
+        self.member = member
+        self.description = description
+        self.setup = setup
+
+
+def nested_archives(zip_ref: zipfile.ZipFile) -> Optional[List[zipfile.ZipInfo]]:
+    """The .zip members of a zip of zips, or None if this is an ordinary archive.
+
+    An archive counts as a zip of zips when every file in it, apart from the
+    manifest and archiver metadata, is itself a .zip.
+    """
+    members = [
+        info for info in zip_ref.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith(IGNORED_PREFIXES)
+        and posixpath.basename(info.filename) != MANIFEST_NAME
+    ]
+    if not members or not all(info.filename.lower().endswith(".zip") for info in members):
+        return None
+    return members
+
+
+def parse_item_settings(spec: Union[str, bytes, None]) -> Union[List[Dict], Dict[str, Dict]]:
+    """Parse per-item settings: a JSON list in item order, or an object keyed by archive name."""
+    if not spec:
+        return {}
+    settings = json.loads(spec)
+    if not isinstance(settings, (list, dict)):
+        raise ValueError("Item settings must be a JSON list or object")
+    return settings
+
+
+def apply_settings(items: List[BatchItem], settings: Union[List[Dict], Dict[str, Dict]]) -> None:
+    """Override items' description/setup; a list applies by item index, an object by archive name."""
+    for item in items:
+        if isinstance(settings, list):
+            entry = settings[item.index] if item.index < len(settings) else {}
+        else:
+            entry = settings.get(item.name) or settings.get(posixpath.basename(item.name)) or {}
+        if not isinstance(entry, dict):
+            raise ValueError(f"Settings for {item.name} must be a JSON object")
+        item.description = str(entry.get("description", item.description))
+        item.setup = str(entry.get("setup", item.setup))
+
+
+def format_ndjson(payload: Dict) -> str:
+    return json.dumps(payload) + "\n"
@@ -0,0 +1,105 @@
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by the failure rate over a time window.
+
+    Closed: calls pass and outcomes are recorded; once at least min_calls outcomes
+    are in the window and the failure rate reaches failure_threshold, it opens.
+    Open: calls are refused until open_seconds have passed, then it goes half-open.
+    Half-open: up to half_open_max_calls probes pass; a success closes the breaker,
+    a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: float = 0.5,
+        min_calls: int = 10,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        # (finished at, succeeded)
+        self.outcomes: Deque[Tuple[float, bool]] = deque()
+        self._state = CLOSED
+        self.opened_at = 0.0
+        self.probes = 0
+        self.rejected = 0
+        self.transitions: Dict[str, int] = {}
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() >= self.opened_at + self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str) -> None:
+        name = f"{self._state}->{state}"
+        self.transitions[name] = self.transitions.get(name, 0) + 1
+        self._state = state
+        self.probes = 0
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        elif state == CLOSED:
+            self.outcomes.clear()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; a half-open probe slot is taken if it does."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self.probes < self.half_open_max_calls:
+            self.probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def release(self) -> None:
+        """Give back a probe slot for a call that ended without a verdict on health."""
+        if self._state == HALF_OPEN and self.probes > 0:
+            self.probes -= 1
+
+    def record_success(self) -> None:
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED)
+            return
+        self._record(True)
+
+    def record_failure(self) -> None:
+        state = self.state
+        if state == HALF_OPEN:
+            self._transition(OPEN)
+            return
+        self._record(False)
+        if state == CLOSED and len(self.outcomes) >= self.min_calls and self.failure_rate() >= self.failure_threshold:
+            self._transition(OPEN)
+
+    def _record(self, succeeded: bool) -> None:
+        now = time.monotonic()
+        self.outcomes.append((now, succeeded))
+        while self.outcomes and self.outcomes[0][0] < now - self.window_seconds:
+            self.outcomes.popleft()
+
+    def failure_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, succeeded in self.outcomes if not succeeded) / len(self.outcomes)
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "failure_rate": self.failure_rate(),
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions)
+        }
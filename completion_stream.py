@@ -0,0 +1,54 @@
+import json
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from retry import LLMCallError
+
+ReasoningCallback = Callable[[str], Awaitable[None]]
+
+# Only re-check for a finished answer when a chunk could have closed a JSON object
+COMPLETION_MARKER = "}"
+
+
+async def read_completion_stream(
+    lines: AsyncIterator[str],
+    is_complete: Callable[[str], bool],
+    on_reasoning: Optional[ReasoningCallback] = None
+) -> str:
+    """Accumulate the content of a streamed chat completion (OpenAI-style SSE).
+
+    Stops reading as soon as is_complete(content) is true, leaving the caller to
+    close the response so the upstream stops generating. Reasoning deltas, which
+    OpenRouter sends separately from the content, are passed to on_reasoning.
+    Raises LLMCallError if the upstream reports an error mid-stream.
+    """
+    content = ""
+    async for line in lines:
+        # Blank separators and ": OPENROUTER PROCESSING" keep-alive comments carry no data
+        if not line.startswith("data:"):
+            continue
+        payload = line[len("data:"):].strip()
+        if payload == "[DONE]":
+            break
+        try:
+            chunk = json.loads(payload)
+        except ValueError:
+            continue
+        if "error" in chunk:
+            error = chunk["error"] if isinstance(chunk["error"], dict) else {"message": str(chunk["error"])}
+            raise LLMCallError(
+                "upstream_error",
+                f"Upstream failed mid-stream: {error.get('message', 'unknown error')}",
+                status_code=error.get("code") if isinstance(error.get("code"), int) else None,
+                attempts=1
+            )
+        choices = chunk.get("choices") or [{}]
+        delta = choices[0].get("delta") or {}
+        reasoning = delta.get("reasoning") or delta.get("reasoning_content")
+        if reasoning and on_reasoning is not None:
+            await on_reasoning(reasoning)
+        text = delta.get("content")
+        if text:
+            content += text
+            if COMPLETION_MARKER in text and is_complete(content):
+                break
+    return content
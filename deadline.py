@@ -0,0 +1,23 @@
+import time
+
+
+class Deadline:
+    """Absolute point in time by which a validation must finish."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cap(self, timeout: float) -> float:
+        """Shrink a per-operation timeout so it cannot outlive the deadline."""
+        return min(timeout, self.remaining())
+
+    def extend_to(self, other: "Deadline") -> None:
+        """Push the expiry out to other's, if that is later."""
+        self.expires_at = max(self.expires_at, other.expires_at)
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class BlockingExecutor:
+    """Sized thread pool for disk- and CPU-bound work, so it never runs on the event loop."""
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "blocking"):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            self.submitted += 1
+
+        def tracked() -> Any:
+            with self._lock:
+                self.started += 1
+            try:
+                return fn(*args)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.completed += 1
+
+        return await asyncio.get_running_loop().run_in_executor(self._pool, tracked)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self.submitted - self.started,
+                "active": self.started - self.completed,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed
+            }
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobStore:
+    """SQLite-backed record of validation jobs, so queued work survives a restart."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, archive_path TEXT NOT NULL, "
+                "description TEXT NOT NULL, setup TEXT NOT NULL, result TEXT, error TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "tenant" not in columns:
+                # Added after the table was first created
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN tenant TEXT NOT NULL DEFAULT ''")
+
+    def create(self, archive_path: str, description: str, setup: str, tenant: str = "") -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, archive_path, description, setup, tenant, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, archive_path, description, setup, tenant, now, now)
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def unfinished(self) -> List[Dict]:
+        """Jobs that were queued or running when the process last stopped."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def update(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+def remove_archive(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class JobWorkerPool:
+    """Fixed set of asyncio workers draining a queue of job ids.
+
+    When run_blocking is given, job store queries and archive removal go through it
+    instead of running on the event loop.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handler: Callable[[Dict], Awaitable[Dict]],
+        workers: int = 2,
+        run_blocking: Optional[Callable[..., Awaitable[Any]]] = None
+    ):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.run_blocking = run_blocking
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    async def _blocking(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.run_blocking is not None:
+            return await self.run_blocking(fn, *args)
+        return fn(*args)
+
+    async def start(self) -> None:
+        # Re-enqueue anything interrupted by the previous shutdown
+        for job in await self._blocking(self.store.unfinished):
+            await self._blocking(self.store.update, job["id"], QUEUED)
+            self._queue.put_nowait(job["id"])
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job_id: str) -> None:
+        self._queue.put_nowait(job_id)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await self._blocking(self.store.get, job_id)
+        if job is None:
+            return
+        await self._blocking(self.store.update, job_id, RUNNING)
+        try:
+            result = await self.handler(job)
+        except asyncio.CancelledError:
+            # Left as running so the next start re-enqueues it
+            raise
+        except Exception as e:
+            await self._blocking(self.store.update, job_id, FAILED, None, str(e))
+        else:
+            await self._blocking(self.store.update, job_id, SUCCEEDED, result)
+        await self._blocking(remove_archive, job["archive_path"])
@@ -1,16 +1,41 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Header, Request
 from openai import OpenAI
 from pydantic import BaseModel
 import zipfile
-import io
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional, BinaryIO, Callable, Awaitable, AsyncIterator, Tuple
+from contextlib import asynccontextmanager
 import mimetypes
+import json
 import httpx
 import tempfile
 import shutil
+import asyncio
+import hashlib
+import time
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
+from cache import LRUCache, SQLiteCache, TieredCache, make_cache_key
+from jobs import JobStore, JobWorkerPool, QUEUED
+from uploads import SeekableSpooledFile, UploadSizeLimitMiddleware, hash_file, take_upload
+from admission import AdmissionController, AdmissionMiddleware
+from executor import BlockingExecutor
+from retry import LLMCallError, RetryPolicy, send_with_retry
+from deadline import Deadline
+from singleflight import SingleFlight
+from model_router import ModelConfig, ModelRouter, parse_model_pool
+from scheduler import BATCH, DEFAULT_TENANT, INTERACTIVE, Caller, FairScheduler, parse_weights, tenant_from_headers
+from circuit_breaker import CircuitBreaker
+from zip_guard import ArchiveLimits, ArchiveRejected, check_archive, open_guarded, rejected_result
+from prompt_planner import PlannedFile, estimate_tokens, group_by_budget, plan_packs, render_pack
+from verdict import Verdict, findings_by_path, has_structured_result, parse_part_review, parse_verdict
+from completion_stream import ReasoningCallback, read_completion_stream
+from submissions import SubmissionStore, diff_summary, hash_member
+from batch import (
+    MANIFEST_NAME, BatchItem, apply_settings, format_ndjson, nested_archives, parse_item_settings
+)
+from zip_filter import MemberFilter, DEFAULT_SKIP_DIRECTORIES, DEFAULT_SKIP_PATTERNS, skipped_result
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
 
@@ -23,7 +48,223 @@ MODEL_NAME = os.getenv("MODEL_NAME", "deepseek/deepseek-r1-0528-qwen3-8b:free")
 SITE_URL = os.getenv("SITE_URL", "http://localhost:3000")
 SITE_NAME = os.getenv("SITE_NAME", "Model Validator API")
 
-app = FastAPI()
+# Thread pool for blocking zip, disk and SQLite work
+IO_WORKERS = int(os.getenv("IO_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+# Shared HTTP client settings for upstream LLM calls
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+# Concurrency caps for LLM calls (global across requests, and per request)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+FILE_ANALYSIS_CONCURRENCY = int(os.getenv("FILE_ANALYSIS_CONCURRENCY", "4"))
+# Fair-queueing weights for tenants that get a larger share of LLM calls, as "tenant=weight,..."
+TENANT_WEIGHTS = os.getenv("TENANT_WEIGHTS", "")
+# Tenants come from the API key; only enable this when a gateway in front sets X-Tenant-ID
+TRUST_TENANT_HEADER = os.getenv("TRUST_TENANT_HEADER", "false").lower() in ("1", "true", "yes")
+
+# Timeouts: each LLM call's connect/read timeouts, and the end-to-end validation deadline
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120"))
+VALIDATION_TIMEOUT = float(os.getenv("VALIDATION_TIMEOUT", "300"))
+MAX_VALIDATION_TIMEOUT = float(os.getenv("MAX_VALIDATION_TIMEOUT", "900"))
+
+# Model pool: MODEL_NAME plus MODEL_FALLBACKS (comma-separated), or LLM_MODEL_POOL as a JSON list of
+# {"name", "max_concurrency", "connect_timeout", "read_timeout"} objects with the primary first
+MODEL_FALLBACKS = os.getenv("MODEL_FALLBACKS", "")
+LLM_MODEL_POOL = os.getenv("LLM_MODEL_POOL", "")
+MODEL_HEALTH_WINDOW = float(os.getenv("MODEL_HEALTH_WINDOW", "300"))
+MODEL_MAX_ERROR_RATE = float(os.getenv("MODEL_MAX_ERROR_RATE", "0.5"))
+# Race a slow call against the next model after LLM_HEDGE_DELAY seconds (or the model's p95, if lower)
+LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "30"))
+# Per-model circuit breaker: open at this failure rate over the window, then probe after CIRCUIT_OPEN_SECONDS
+CIRCUIT_FAILURE_THRESHOLD = float(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "0.5"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_WINDOW = float(os.getenv("CIRCUIT_WINDOW", "60"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_CALLS", "1"))
+
+# How often an in-flight validation checks whether its client has gone away
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+# Retries for OpenRouter calls: decorrelated jitter, honouring Retry-After, bounded in total time
+LLM_RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "4"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+LLM_RETRY_TOTAL_TIMEOUT = float(os.getenv("LLM_RETRY_TOTAL_TIMEOUT", "120"))
+
+# LLM verdict cache: in-process LRU tier, plus an optional SQLite tier when a path is set
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "")
+
+# Whole-submission result cache, keyed by the sha256 of the uploaded archive
+SUBMISSION_CACHE_MAX_ENTRIES = int(os.getenv("SUBMISSION_CACHE_MAX_ENTRIES", "512"))
+SUBMISSION_CACHE_TTL = float(os.getenv("SUBMISSION_CACHE_TTL", "86400"))
+
+# Upload limits: uploads are hashed in chunks where Starlette spooled them; nested archives
+# are copied into a spooled temp file of UPLOAD_SPOOL_MEMORY_BYTES
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_BYTES", str(4 * 1024 * 1024)))
+# Allowance for multipart boundaries and the description/setup form fields
+UPLOAD_FORM_OVERHEAD_BYTES = int(os.getenv("UPLOAD_FORM_OVERHEAD_BYTES", str(1024 * 1024)))
+
+# Admission control for synchronous validations: concurrent requests, request bytes in flight,
+# and how many may queue (and for how long) before getting 429 with Retry-After
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+ADMISSION_MAX_BYTES = int(os.getenv("ADMISSION_MAX_BYTES", str(4 * MAX_UPLOAD_BYTES)))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+# Body bytes a queued request may buffer while watching for its client to disconnect
+ADMISSION_QUEUE_BUFFER_BYTES = int(os.getenv("ADMISSION_QUEUE_BUFFER_BYTES", str(1024 * 1024)))
+
+# Batch validation: archives per request, their combined upload size, and how many run at once
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "100"))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+MAX_MANIFEST_BYTES = 1024 * 1024
+
+# Central directory pre-filter: comma-separated overrides for skipped directories and glob patterns
+SKIP_DIRECTORIES = os.getenv("SKIP_DIRECTORIES", ",".join(DEFAULT_SKIP_DIRECTORIES))
+SKIP_PATTERNS = os.getenv("SKIP_PATTERNS", ",".join(DEFAULT_SKIP_PATTERNS))
+# Binary members over MAX_ANALYZED_MEMBER_BYTES and non-Python text over MAX_ANALYZED_TEXT_BYTES are
+# skipped; Python sources of any size are chunked across prompts
+MAX_ANALYZED_MEMBER_BYTES = int(os.getenv("MAX_ANALYZED_MEMBER_BYTES", str(1024 * 1024)))
+MAX_ANALYZED_TEXT_BYTES = int(os.getenv("MAX_ANALYZED_TEXT_BYTES", str(1024 * 1024)))
+# Archives with more source than this for the model are rejected before any of it is read
+MAX_ANALYZED_SOURCE_BYTES = int(os.getenv("MAX_ANALYZED_SOURCE_BYTES", str(4 * 1024 * 1024)))
+MAX_MEMBER_COMPRESSION_RATIO = float(os.getenv("MAX_MEMBER_COMPRESSION_RATIO", "100"))
+
+# Archive guardrails, checked against the central directory before any decompression
+MAX_ARCHIVE_MEMBERS = int(os.getenv("MAX_ARCHIVE_MEMBERS", "10000"))
+MAX_ARCHIVE_UNCOMPRESSED_BYTES = int(os.getenv("MAX_ARCHIVE_UNCOMPRESSED_BYTES", str(1024 * 1024 * 1024)))
+MAX_ARCHIVE_COMPRESSION_RATIO = float(os.getenv("MAX_ARCHIVE_COMPRESSION_RATIO", "200"))
+MAX_ARCHIVE_PATH_DEPTH = int(os.getenv("MAX_ARCHIVE_PATH_DEPTH", "32"))
+
+# Prompt packing: files are packed into as few LLM calls as fit the model's context window
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "32768"))
+COMPLETION_TOKEN_RESERVE = int(os.getenv("COMPLETION_TOKEN_RESERVE", "8192"))
+# Ask for response_format json_object; only enable for models that support it
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "false").lower() in ("1", "true", "yes")
+# Stream completions and stop reading once the JSON result is complete; always on when reasoning is forwarded
+LLM_STREAMING = os.getenv("LLM_STREAMING", "false").lower() in ("1", "true", "yes")
+
+# Asynchronous validation jobs: archives and the SQLite job store live under JOBS_DIR
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(tempfile.gettempdir(), "model_validator_jobs"))
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(JOBS_DIR, "jobs.db"))
+
+# Incremental re-validation: per-file hashes and findings of each model's latest submission
+SUBMISSIONS_DB_PATH = os.getenv("SUBMISSIONS_DB_PATH", os.path.join(JOBS_DIR, "submissions.db"))
+# Upper bound on the change summary given to the verdict prompt
+MAX_DIFF_CONTEXT_TOKENS = int(os.getenv("MAX_DIFF_CONTEXT_TOKENS", "2000"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+http_client: Optional[httpx.AsyncClient] = None
+retry_policy = RetryPolicy(
+    max_attempts=LLM_RETRY_MAX_ATTEMPTS,
+    base_delay=LLM_RETRY_BASE_DELAY,
+    max_delay=LLM_RETRY_MAX_DELAY,
+    total_timeout=LLM_RETRY_TOTAL_TIMEOUT
+)
+llm_singleflight = SingleFlight()
+# Work abandoned because the client disconnected
+cancellation_counts = {"validations": 0, "llm_calls": 0}
+io_executor = BlockingExecutor(IO_WORKERS, thread_name_prefix="validator-io")
+llm_cache = TieredCache(
+    LRUCache(max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL),
+    SQLiteCache(LLM_CACHE_DB_PATH, ttl=LLM_CACHE_TTL) if LLM_CACHE_DB_PATH else None
+)
+submission_cache = TieredCache(
+    LRUCache(max_entries=SUBMISSION_CACHE_MAX_ENTRIES, ttl=SUBMISSION_CACHE_TTL),
+    SQLiteCache(LLM_CACHE_DB_PATH, ttl=SUBMISSION_CACHE_TTL, table="submissions") if LLM_CACHE_DB_PATH else None
+)
+model_router = ModelRouter(
+    parse_model_pool(
+        LLM_MODEL_POOL,
+        [name.strip() for name in MODEL_FALLBACKS.split(",") if name.strip()],
+        ModelConfig(MODEL_NAME, LLM_MAX_CONCURRENCY, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+    ),
+    window_seconds=MODEL_HEALTH_WINDOW,
+    max_error_rate=MODEL_MAX_ERROR_RATE,
+    hedging=LLM_HEDGING,
+    hedge_delay=LLM_HEDGE_DELAY,
+    breaker_factory=lambda: CircuitBreaker(
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        min_calls=CIRCUIT_MIN_CALLS,
+        window_seconds=CIRCUIT_WINDOW,
+        open_seconds=CIRCUIT_OPEN_SECONDS,
+        half_open_max_calls=CIRCUIT_HALF_OPEN_CALLS
+    )
+)
+# Global cap on concurrent LLM calls, shared fairly between tenants
+llm_scheduler = FairScheduler(LLM_MAX_CONCURRENCY, weights=parse_weights(TENANT_WEIGHTS))
+
+os.makedirs(JOBS_DIR, exist_ok=True)
+job_store = JobStore(JOBS_DB_PATH)
+submission_store = SubmissionStore(SUBMISSIONS_DB_PATH)
+archive_limits = ArchiveLimits(
+    max_members=MAX_ARCHIVE_MEMBERS,
+    max_total_bytes=MAX_ARCHIVE_UNCOMPRESSED_BYTES,
+    max_compression_ratio=MAX_ARCHIVE_COMPRESSION_RATIO,
+    max_path_depth=MAX_ARCHIVE_PATH_DEPTH
+)
+member_filter = MemberFilter(
+    skip_directories=[d.strip() for d in SKIP_DIRECTORIES.split(",") if d.strip()],
+    skip_patterns=[p.strip() for p in SKIP_PATTERNS.split(",") if p.strip()],
+    max_member_bytes=MAX_ANALYZED_MEMBER_BYTES,
+    max_text_bytes=MAX_ANALYZED_TEXT_BYTES,
+    max_compression_ratio=MAX_MEMBER_COMPRESSION_RATIO
+)
+job_pool: Optional[JobWorkerPool] = None
+admission = AdmissionController(
+    max_concurrent=ADMISSION_MAX_CONCURRENT,
+    max_bytes=ADMISSION_MAX_BYTES,
+    max_queue=ADMISSION_MAX_QUEUE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT
+)
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create the pooled client shared by every LLM call."""
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+    )
+    return httpx.AsyncClient(limits=limits, http2=HTTP2_ENABLED)
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it if the app was started without lifespan."""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = create_http_client()
+    return http_client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_client, job_pool
+    http_client = create_http_client()
+    model_router.reset_limits()
+    job_pool = JobWorkerPool(job_store, run_validation_job, workers=JOB_WORKERS, run_blocking=io_executor.run)
+    await job_pool.start()
+    try:
+        yield
+    finally:
+        await job_pool.stop()
+        # Drain pooled connections on shutdown
+        await http_client.aclose()
+        http_client = None
+        llm_cache.close()
+        submission_cache.close()
+        job_store.close()
+        submission_store.close()
+        io_executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -34,25 +275,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Abort oversized request bodies before they are fully read
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES,
+    path_limits={"/batch": MAX_BATCH_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES}
+)
+# Outermost, so overloaded requests are turned away before the app reads the body
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    paths=["/process-zip", "/process-zip/stream", "/batch"],
+    default_bytes=MAX_UPLOAD_BYTES,
+    max_buffered_bytes=ADMISSION_QUEUE_BUFFER_BYTES
+)
+
 class AIRequest(BaseModel):
     prompt: str
 
-async def get_ai_analysis(content: str, description: str = "", setup: str = "") -> str:
-    try:
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "HTTP-Referer": SITE_URL,
-            "X-Title": SITE_NAME
-        }
-        
-        data = {
-            "model": MODEL_NAME,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": f"""Analyze the following code and documentation for a machine learning model. Your task is to determine if the model should be PUBLISHED or REJECTED based on these criteria:
-
-1. Code Quality and Relevance:
+# Bump PROMPT_TEMPLATE_VERSION whenever a template changes so cached verdicts are not reused
+PROMPT_TEMPLATE_VERSION = "4"
+ANALYSIS_CRITERIA = """1. Code Quality and Relevance:
    - The code must implement the functionality described in the model description
    - The code must be relevant to the stated purpose
    - Even if the code is simple or minimal, it should be accepted as long as it works
@@ -65,164 +308,1058 @@ async def get_ai_analysis(content: str, description: str = "", setup: str = "")
 
 3. Consistency:
    - The code, description, and setup instructions must all align
-   - There should be no contradictions between them
+   - There should be no contradictions between them"""
+
+# Literal braces are doubled because the templates go through str.format
+VERDICT_JSON_FIELDS = """"verdict": "PUBLISH" or "REJECT", "confidence": <number from 0 to 1>, "scores": {{"code_quality": <0-10>, "documentation": <0-10>, "consistency": <0-10>}}, "reasons": [<at most 3 short reasons, under 20 words each>]"""
+FILES_JSON_FIELD = """"files": [{{"path": "<path exactly as in the input>", "finding": "<one short sentence>"}}]"""
+
+LENIENCY_INSTRUCTIONS = "Be very lenient in your evaluation - if the code works and matches the description, it should be published even if it's simple or uses common libraries. Only reject if the code is completely non-functional or has no relation to the description."
+
+# Single pass: every file fits in one prompt
+ANALYSIS_PROMPT_TEMPLATE = """Analyze the following code and documentation for a machine learning model. Your task is to determine if the model should be PUBLISHED or REJECTED based on these criteria:
+
+""" + ANALYSIS_CRITERIA + """
 
 Model Description: {description}
 
 Setup Instructions: {setup}
 
-Code:
+Files:
 {content}
 
-Based on these criteria, provide a detailed analysis and end with either '✅ PUBLISH' or '❌ REJECT'. Be very lenient in your evaluation - if the code works and matches the description, it should be published even if it's simple or uses common libraries. Only reject if the code is completely non-functional or has no relation to the description."""
-                }
-            ]
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
+Respond with only a JSON object, with one entry in "files" per input file:
+{{""" + FILES_JSON_FIELD + """, """ + VERDICT_JSON_FIELDS + """}}
+
+""" + LENIENCY_INSTRUCTIONS
+
+# Map stage: one part of a repository too large for a single prompt
+MAP_PROMPT_TEMPLATE = """You are reviewing one part of a machine learning model repository that is too large to review at once. Other parts are reviewed separately.
+
+Model Description: {description}
+
+Setup Instructions: {setup}
+
+Files:
+{content}
+
+Respond with only a JSON object, with one entry in "files" per input file and a "summary" of at most 150 words describing what this part implements, whether it looks functional, and how it relates to the model description. Do not give a final verdict.
+{{""" + FILES_JSON_FIELD + """, "summary": "<summary>"}}"""
+
+# Intermediate reduce: merge a group of part summaries when all of them do not fit one prompt
+COMBINE_PROMPT_TEMPLATE = """You are reviewing a machine learning model repository that is too large to review at once. Its parts were reviewed separately; below are the summaries of some of them.
+
+Model Description: {description}
+
+Setup Instructions: {setup}
+
+Summaries:
+{content}
+
+Respond with only a JSON object with a "summary" of at most 150 words combining these summaries: what these parts implement, whether they look functional, and how they relate to the model description. Do not give a final verdict.
+{{"summary": "<summary>"}}"""
+
+# Reduce stage: verdict from the map-stage summaries
+REDUCE_PROMPT_TEMPLATE = """Analyze the following machine learning model. Your task is to determine if the model should be PUBLISHED or REJECTED based on these criteria:
+
+""" + ANALYSIS_CRITERIA + """
+
+Model Description: {description}
+
+Setup Instructions: {setup}
+
+The code was too large to review at once, so each part was reviewed separately. Summaries of the parts:
+{content}
+
+Respond with only a JSON object:
+{{""" + VERDICT_JSON_FIELDS + """}}
+
+""" + LENIENCY_INSTRUCTIONS
+
+async def get_ai_analysis(
+    content: str,
+    description: str = "",
+    setup: str = "",
+    prompt_template: str = ANALYSIS_PROMPT_TEMPLATE,
+    deadline: Optional[Deadline] = None,
+    on_reasoning: Optional[ReasoningCallback] = None,
+    caller: Optional[Caller] = None
+) -> str:
+    """Return the model's analysis, raising LLMCallError once retries are exhausted.
+    
+    Identical prompts already in flight share one upstream call. Its connect/read
+    timeouts and retry budget are capped by the latest deadline among the callers
+    sharing it (uncapped if any has none), while each caller stops waiting at its own
+    deadline with a deadline_exceeded error, so a short deadline never fails the others.
+    on_reasoning, when given, receives the model's reasoning as it streams; a caller
+    joining an identical call already in flight gets the result without the reasoning.
+    The shared call is charged to the caller that started it: scheduled for its tenant
+    and lane (an anonymous interactive caller by default).
+    """
+    cache_key = make_cache_key(model_router.key, prompt_template, description, setup, content)
+    cached = await io_executor.run(llm_cache.get, cache_key)
+    if cached is not None:
+        return cached
+    
+    try:
+        return await llm_singleflight.do(
+            cache_key,
+            lambda shared_deadline: call_model(
+                cache_key, content, description, setup, prompt_template, shared_deadline, on_reasoning, caller
+            ),
+            deadline
+        )
+    except asyncio.TimeoutError:
+        raise LLMCallError("deadline_exceeded", "Validation deadline exceeded while waiting for the model")
+
+async def call_model(
+    cache_key: str,
+    content: str,
+    description: str,
+    setup: str,
+    prompt_template: str,
+    deadline: Optional[Deadline],
+    on_reasoning: Optional[ReasoningCallback] = None,
+    caller: Optional[Caller] = None
+) -> str:
+    """Route the prompt to a model in the pool and cache the result under cache_key."""
+    prompt = prompt_template.format(description=description, setup=setup, content=content)
+    
+    async def attempt(model: ModelConfig, primary: bool) -> str:
+        # Hedged and fallback attempts do not forward reasoning, so streams never interleave
+        return await call_single_model(model, prompt, deadline, on_reasoning if primary else None, caller)
+    
+    try:
+        analysis = await model_router.call(attempt)
+    except asyncio.CancelledError:
+        cancellation_counts["llm_calls"] += 1
+        raise
+    await io_executor.run(llm_cache.set, cache_key, analysis)
+    return analysis
+
+async def call_single_model(
+    model: ModelConfig,
+    prompt: str,
+    deadline: Optional[Deadline],
+    on_reasoning: Optional[ReasoningCallback] = None,
+    caller: Optional[Caller] = None
+) -> str:
+    """Make the upstream chat completion call to one model, with retries."""
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "HTTP-Referer": SITE_URL,
+        "X-Title": SITE_NAME
+    }
+    
+    data = {
+        "model": model.name,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "max_tokens": COMPLETION_TOKEN_RESERVE
+    }
+    if LLM_JSON_MODE:
+        data["response_format"] = {"type": "json_object"}
+    stream = LLM_STREAMING or on_reasoning is not None
+    if stream:
+        data["stream"] = True
+    streamed_content = None
+    
+    client = get_http_client()
+    
+    async def send() -> httpx.Response:
+        nonlocal streamed_content
+        # Hold a concurrency slot only while the request is in flight, not while backing off.
+        # The model's own limit comes first, so a call queued on a busy model holds no global slot
+        async with model_router.semaphore(model), llm_scheduler.slot(caller):
+            connect_timeout, read_timeout = model.connect_timeout, model.read_timeout
+            if deadline is not None:
+                if deadline.expired():
+                    raise LLMCallError("deadline_exceeded", "Validation deadline exceeded before the call was sent")
+                connect_timeout, read_timeout = deadline.cap(connect_timeout), deadline.cap(read_timeout)
+            # A timeout the deadline shortened is the deadline running out, not the model failing;
+            # httpx applies the read timeout to writes and pool waits too
+            connect_capped = connect_timeout < model.connect_timeout
+            read_capped = read_timeout < model.read_timeout
+            request = client.build_request(
+                "POST",
                 f"{OPENROUTER_BASE_URL}/chat/completions",
                 headers=headers,
-                json=data
+                json=data,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
-            else:
-                return f"Error: API returned status code {response.status_code}"
-            
-    except Exception as e:
-        return f"Error in AI analysis: {str(e)}"
+            try:
+                response = await client.send(request, stream=stream)
+                if stream:
+                    # Closing the response early tells the upstream to stop generating
+                    try:
+                        if response.is_success:
+                            streamed_content = await read_completion_stream(
+                                response.aiter_lines(), has_structured_result, on_reasoning
+                            )
+                    finally:
+                        await response.aclose()
+            except httpx.TimeoutException as e:
+                if connect_capped if isinstance(e, httpx.ConnectTimeout) else read_capped:
+                    raise LLMCallError("deadline_exceeded", f"Validation deadline exceeded during the call: {e!r}")
+                raise
+            return response
+    
+    retry_deadline = time.monotonic() + retry_policy.total_timeout
+    if deadline is not None:
+        retry_deadline = min(retry_deadline, deadline.expires_at)
+    response = await send_with_retry(send, retry_policy, deadline=retry_deadline)
+    try:
+        if stream:
+            if not streamed_content:
+                raise ValueError("stream ended without any content")
+            analysis = streamed_content
+        else:
+            analysis = response.json()['choices'][0]['message']['content']
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise LLMCallError(
+            "invalid_response",
+            f"Unexpected response body: {e!r}",
+            status_code=response.status_code,
+            attempts=1
+        )
+    return analysis
+
+async def gather_cancelling(*aws: Awaitable) -> List:
+    """asyncio.gather that cancels the remaining awaitables as soon as one fails."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
 
 @app.get("/")
 def root():
     return {"message": "FastAPI is running!"}
 
-async def analyze_file_content(file_path: str, description: str = "", setup: str = "") -> Dict:
-    """Analyze the content of a file and return its details."""
+@app.get("/metrics")
+def metrics():
+    return {
+        "llm_cache": llm_cache.stats(),
+        "llm_singleflight": llm_singleflight.stats(),
+        "llm_router": model_router.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "submission_cache": submission_cache.stats(),
+        "jobs": {"queue_depth": job_pool.queue_depth if job_pool else 0},
+        "admission": admission.stats(),
+        "io_executor": io_executor.stats(),
+        "cancelled": dict(cancellation_counts)
+    }
+
+# Text files whose full content goes to the model
+MODEL_CONTENT_TYPES = ('text/x-python', 'text/plain')
+
+def sent_to_model(path: str) -> bool:
+    return mimetypes.guess_type(path)[0] in MODEL_CONTENT_TYPES
+
+def read_member_text(open_member: Callable[[], BinaryIO]) -> str:
+    with open_member() as f:
+        return f.read().decode('utf-8')
+
+async def analyze_file_content(
+    file_path: str,
+    file_size: int,
+    open_member: Callable[[], BinaryIO]
+) -> Tuple[Dict, Optional[str]]:
+    """Analyze an archive member and return its details, plus its full text when it should go to the model.
+    
+    open_member is only called for members whose content is actually needed.
+    """
+    file_name = os.path.basename(file_path)
     try:
         # Skip hidden files
-        if os.path.basename(file_path).startswith('._'):
+        if file_name.startswith('._'):
             return {
-                "file_name": os.path.basename(file_path),
+                "file_name": file_name,
                 "file_type": "hidden",
-                "file_size": f"{os.path.getsize(file_path)} bytes",
+                "file_size": f"{file_size} bytes",
                 "content": "Hidden system file",
                 "ai_analysis": ""
-            }
+            }, None
             
         # Get file type
         mime_type, _ = mimetypes.guess_type(file_path)
         file_type = mime_type if mime_type else 'unknown'
         
-        # Get file size
-        file_size = os.path.getsize(file_path)
-        
         # Read file content based on type
         content = ""
-        ai_analysis = ""
+        model_content = None
         
         if file_type.startswith('text/'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            # Get AI analysis for text files
-            if file_type == 'text/x-python' or file_type == 'text/plain':
-                ai_analysis = await get_ai_analysis(content, description, setup)
+            content = await io_executor.run(read_member_text, open_member)
+            # Text files are sent to the model in packed prompts
+            if file_type in MODEL_CONTENT_TYPES:
+                model_content = content
         elif file_type.startswith('image/'):
             content = "Binary image file"
         else:
             content = "Binary file"
             
         return {
-            "file_name": os.path.basename(file_path),
+            "file_name": file_name,
             "file_type": file_type,
             "file_size": f"{file_size} bytes",
             "content": content[:1000] + "..." if len(content) > 1000 else content,
-            "ai_analysis": ai_analysis
-        }
+            "ai_analysis": ""
+        }, model_content
+    except ArchiveRejected:
+        # A guardrail tripped mid-read: abort the whole archive, not just this file
+        raise
     except Exception as e:
         return {
-            "file_name": os.path.basename(file_path),
+            "file_name": file_name,
             "error": f"Error analyzing file: {str(e)}"
-        }
+        }, None
+
+def prompt_token_budget(description: str, setup: str) -> int:
+    """Tokens left for file content once the template, description, setup and completion are accounted for."""
+    overhead = estimate_tokens(ANALYSIS_PROMPT_TEMPLATE.format(description=description, setup=setup, content=""))
+    return max(1024, MODEL_CONTEXT_TOKENS - COMPLETION_TOKEN_RESERVE - overhead)
+
+# Floor on each part summary's share of the reduce prompt; smaller shares are merged in groups instead
+MIN_SUMMARY_TOKENS = 256
+
+PackCallback = Callable[[List[PlannedFile], Dict[str, str]], Awaitable[None]]
+# Called with (stage, reasoning delta); stage is "analysis", "part N of M" or "reduce"
+StageReasoningCallback = Callable[[str, str], Awaitable[None]]
+
+async def analyze_packed_files(
+    files: List[PlannedFile],
+    description: str,
+    setup: str,
+    on_pack_done: PackCallback,
+    deadline: Optional[Deadline] = None,
+    on_reasoning: Optional[StageReasoningCallback] = None,
+    caller: Optional[Caller] = None,
+    context: str = ""
+) -> Verdict:
+    """Send files to the model in as few packed prompts as fit the context window.
+    
+    When everything fits in one prompt, that single call gives the findings and the
+    verdict. Otherwise the packs run concurrently as a map stage that returns findings
+    and a summary per pack, and a reduce call gives the verdict from the summaries.
+    
+    Raises LLMCallError if any call fails after retries. on_pack_done is awaited with
+    each pack and its per-file findings, keyed by label, as it completes. context, when
+    given, is placed ahead of the files in whichever prompt gives the verdict.
+    """
+    def stage_reasoning(stage: str) -> Optional[ReasoningCallback]:
+        if on_reasoning is None:
+            return None
+        
+        async def forward(delta: str) -> None:
+            await on_reasoning(stage, delta)
+        return forward
+    
+    budget = max(1024, prompt_token_budget(description, setup) - estimate_tokens(context))
+    packs = plan_packs(files, budget, description)
+    single_pass = len(packs) == 1
+    template = ANALYSIS_PROMPT_TEMPLATE if single_pass else MAP_PROMPT_TEMPLATE
+    pack_semaphore = asyncio.Semaphore(FILE_ANALYSIS_CONCURRENCY)
+    
+    async def run_pack(i: int, pack: List[PlannedFile]):
+        stage = "analysis" if single_pass else f"part {i + 1} of {len(packs)}"
+        content = render_pack(pack)
+        if single_pass and context:
+            content = context + "\n\n" + content
+        async with pack_semaphore:
+            response = await get_ai_analysis(
+                content, description, setup, template, deadline, stage_reasoning(stage), caller
+            )
+        review = parse_verdict(response) if single_pass else parse_part_review(response)
+        await on_pack_done(pack, findings_by_path(review.files))
+        return review
+    
+    reviews = await gather_cancelling(*(run_pack(i, pack) for i, pack in enumerate(packs)))
+    if single_pass:
+        return reviews[0]
+    
+    # Reduce stage: summaries are merged in groups, level by level, until they fit one prompt
+    summary_tokens = max(MIN_SUMMARY_TOKENS, budget // len(reviews))
+    summaries = []
+    for i, (pack, review) in enumerate(zip(packs, reviews)):
+        labels = ", ".join(planned.label for planned in pack)
+        summaries.append(f"## Part {i + 1} of {len(reviews)} ({labels})\n{review.summary[:summary_tokens * 4]}")
+    level = 0
+    while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > budget:
+        level += 1
+        groups = group_by_budget(summaries, budget)
+        
+        async def combine(i: int, group: List[str], level: int = level, count: int = len(groups)) -> str:
+            async with pack_semaphore:
+                response = await get_ai_analysis(
+                    "\n\n".join(group), description, setup, COMBINE_PROMPT_TEMPLATE, deadline,
+                    stage_reasoning(f"combine {i + 1} of {count} (level {level})"), caller
+                )
+            summary = parse_part_review(response).summary[:MIN_SUMMARY_TOKENS * 4]
+            return f"## Combined summary {i + 1} of {count}\n{summary}"
+        
+        summaries = await gather_cancelling(*(combine(i, group) for i, group in enumerate(groups)))
+    if context:
+        summaries.insert(0, context)
+    response = await get_ai_analysis(
+        "\n\n".join(summaries), description, setup, REDUCE_PROMPT_TEMPLATE, deadline, stage_reasoning("reduce"), caller
+    )
+    return parse_verdict(response)
+
+def submission_digest(upload_sha256: str, description: str = "", setup: str = "") -> str:
+    """Cache key for a whole submission.
+
+    Built from the sha256 of the uploaded bytes rather than the central directory:
+    CRCs and sizes there are attacker-controlled, so an archive with different code
+    could otherwise claim an earlier archive's result.
+    """
+    return make_cache_key(model_router.key, PROMPT_TEMPLATE_VERSION, description, setup, upload_sha256)
+
+def is_cacheable_result(result: Dict) -> bool:
+    """Only cache complete results that did not hit upstream errors or unreadable files."""
+    if "ai_error" in result or result.get("partial"):
+        return False
+    return not any("error" in analysis for analysis in result.get("files_analyzed", []))
+
+EventCallback = Callable[[str, Dict], Awaitable[None]]
+
+async def validate_archive(
+    zip_file: BinaryIO,
+    description: str,
+    setup: str,
+    on_event: Optional[EventCallback] = None,
+    deadline: Optional[Deadline] = None,
+    stream_reasoning: bool = False,
+    caller: Optional[Caller] = None,
+    model_id: Optional[str] = None,
+    upload_sha256: Optional[str] = None
+) -> Dict:
+    """Run the full validation of an uploaded archive and return the response body.
+    
+    on_event, when given, is awaited with (event name, payload) as each stage completes,
+    and with "reasoning" events carrying the model's reasoning if stream_reasoning is set.
+    LLM calls are scheduled for caller's tenant and priority lane.
+    If the deadline (VALIDATION_TIMEOUT by default) passes, the result is returned with
+    partial set and whatever was analyzed so far.
+    
+    With a model_id, files unchanged since the model's previous submission (same
+    description and setup) keep their earlier findings instead of being analyzed again,
+    and only changed files go to the model along with a summary of the changes.
+    Otherwise an identical earlier upload's result is returned from the submission
+    cache; upload_sha256 is computed from zip_file when not given.
+    """
+    if deadline is None:
+        deadline = Deadline(VALIDATION_TIMEOUT)
+    
+    settings_key = make_cache_key(description, setup)
+    previous = None
+    if model_id is not None:
+        previous = await io_executor.run(submission_store.latest, model_id)
+    # Findings only carry over when the model was judged against the same description and setup
+    reusable = previous["files"] if previous is not None and previous["settings_key"] == settings_key else {}
+    file_hashes: Dict[int, str] = {}
+    reused = set()
+    
+    async def emit(event: str, payload: Dict) -> None:
+        if on_event is not None:
+            await on_event(event, payload)
+    
+    try:
+        # Reading the central directory touches disk once the upload has spooled over
+        zip_ref = await io_executor.run(zipfile.ZipFile, zip_file, 'r')
+        with zip_ref:
+            # Reject hostile or oversized archives up front
+            await io_executor.run(check_archive, zip_ref, archive_limits)
+            
+            # Return the stored result for an identical earlier submission; versioned
+            # submissions are tracked per model instead
+            cached = None
+            if model_id is None:
+                if upload_sha256 is None:
+                    upload_sha256 = await io_executor.run(hash_file, zip_file, UPLOAD_CHUNK_SIZE)
+                digest = submission_digest(upload_sha256, description, setup)
+                cached = await io_executor.run(submission_cache.get, digest)
+            if cached is not None:
+                result = json.loads(cached)
+                await emit("verdict", result)
+                return result
+            
+            # Members are read straight from the archive, nothing is extracted to disk
+            members = [info for info in zip_ref.infolist() if not info.is_dir()]
+            # Drop irrelevant members using only central directory metadata
+            skip_reasons = await io_executor.run(
+                lambda: [member_filter.skip_reason(info) for info in members]
+            )
+            # Bound the prompts (and LLM calls) one submission can cause
+            source_bytes = sum(
+                info.file_size for info, reason in zip(members, skip_reasons)
+                if reason is None and sent_to_model(info.filename)
+            )
+            if source_bytes > MAX_ANALYZED_SOURCE_BYTES:
+                raise ArchiveRejected(
+                    f"{source_bytes} bytes of source to analyze, limit is {MAX_ANALYZED_SOURCE_BYTES}"
+                )
+            await emit("extraction_done", {
+                "file_count": len(members),
+                "skipped_count": sum(reason is not None for reason in skip_reasons)
+            })
+            
+            # Read files concurrently, bounded per request
+            request_semaphore = asyncio.Semaphore(FILE_ANALYSIS_CONCURRENCY)
+            
+            async def read_bounded(index: int, info: zipfile.ZipInfo) -> Tuple[Dict, Optional[str]]:
+                if skip_reasons[index] is not None:
+                    return skipped_result(info, skip_reasons[index]), None
+                async with request_semaphore:
+                    if deadline.expired():
+                        return skipped_result(info, "validation deadline exceeded"), None
+                    if model_id is not None:
+                        file_hashes[index] = await io_executor.run(
+                            hash_member, lambda: open_guarded(zip_ref, info)
+                        )
+                        prior = reusable.get(info.filename)
+                        if prior is not None and prior["sha256"] == file_hashes[index]:
+                            reused.add(index)
+                            return dict(prior["analysis"]), None
+                    return await analyze_file_content(
+                        info.filename,
+                        info.file_size,
+                        lambda: open_guarded(zip_ref, info)
+                    )
+            
+            # gather keeps results in the same order as the archive members; a corrupt member stops the rest
+            file_reads = await gather_cancelling(
+                *(read_bounded(index, info) for index, info in enumerate(members))
+            )
+    except ArchiveRejected as e:
+        result = rejected_result(str(e))
+        await emit("verdict", result)
+        return result
+    
+    file_analyses = [analysis for analysis, _ in file_reads]
+    planned_files = []
+    has_python_files = False
+    unreadable_python_files = []
+    skipped_python_files = []
+    for index, (info, reason, (analysis, model_content)) in enumerate(zip(members, skip_reasons, file_reads)):
+        # Check for Python files
+        if info.filename.endswith('.py') and reason is None:
+            has_python_files = True
+            if "error" in analysis:
+                unreadable_python_files.append(info.filename)
+        elif info.filename.endswith('.py'):
+            skipped_python_files.append(f"{info.filename} ({reason})")
+        if model_content is not None:
+            planned_files.append(PlannedFile(index, info.filename, model_content))
+        else:
+            await emit("file_analyzed", {"index": index, **analysis})
+    
+    # Basic validation rules
+    validation_message = []
+    partial = deadline.expired()
+    if not has_python_files and skipped_python_files:
+        validation_message.append("No Python files could be analyzed; skipped: " + ", ".join(skipped_python_files))
+    elif not has_python_files:
+        validation_message.append("No Python files found in the ZIP")
+    if unreadable_python_files:
+        # Code the model never saw cannot pass
+        validation_message.append("Could not read Python files: " + ", ".join(unreadable_python_files))
+    
+    async def on_pack_done(pack: List[PlannedFile], findings: Dict[str, str]) -> None:
+        for planned in pack:
+            analysis = file_analyses[planned.index]
+            finding = findings.get(planned.label, "")
+            if planned.parts > 1:
+                # Chunks of a large file may land in different packs
+                finding = f"(part {planned.part} of {planned.parts}) {finding}"
+                if analysis["ai_analysis"]:
+                    finding = analysis["ai_analysis"] + "\n\n" + finding
+            analysis["ai_analysis"] = finding
+            await emit("file_analyzed", {"index": planned.index, **analysis})
+    
+    # Per-file findings and the overall verdict come from the same packed calls
+    ai_analysis = None
+    ai_verdict = None
+    ai_error = None
+    context = ""
+    submission = None
+    if model_id is not None:
+        submission = {"model_id": model_id, "previous_version": previous["version"] if previous else None}
+        if reusable:
+            current_paths = {info.filename for info in members}
+            changed = [
+                members[index].filename for index in sorted(file_hashes)
+                if index not in reused and members[index].filename in reusable
+            ]
+            added = [
+                members[index].filename for index in sorted(file_hashes)
+                if index not in reused and members[index].filename not in reusable
+            ]
+            removed = sorted(path for path in reusable if path not in current_paths)
+            unchanged = {
+                members[index].filename: file_analyses[index].get("ai_analysis", "") for index in sorted(reused)
+            }
+            submission.update({"changed": changed, "added": added, "removed": removed, "reused": len(reused)})
+            context = diff_summary(previous, changed, added, removed, unchanged, MAX_DIFF_CONTEXT_TOKENS * 4)
+    on_reasoning = None
+    if on_event is not None and stream_reasoning:
+        async def on_reasoning(stage: str, delta: str) -> None:
+            await on_event("reasoning", {"stage": stage, "delta": delta})
+    
+    if has_python_files and planned_files:
+        try:
+            verdict = await asyncio.wait_for(
+                analyze_packed_files(
+                    planned_files, description, setup, on_pack_done, deadline, on_reasoning, caller, context
+                ),
+                timeout=deadline.remaining()
+            )
+        except asyncio.TimeoutError:
+            partial = True
+        except LLMCallError as e:
+            ai_error = e.to_dict()
+            validation_message.append(f"AI analysis unavailable: {e.message}")
+        else:
+            ai_analysis = verdict.summary_text()
+            ai_verdict = verdict.model_dump(exclude={"files"})
+            if verdict.is_rejected:
+                validation_message.append("Code appears to be a placeholder or test code")
+    elif has_python_files and reused and previous["verdict"] is not None:
+        # Nothing new to analyze: the previous verdict still stands
+        verdict = Verdict.model_validate(previous["verdict"])
+        ai_analysis = verdict.summary_text()
+        ai_verdict = previous["verdict"]
+        if verdict.is_rejected:
+            validation_message.append("Code appears to be a placeholder or test code")
+    else:
+        # Nothing worth a model call: report the text files as read
+        for planned in planned_files:
+            await emit("file_analyzed", {"index": planned.index, **file_analyses[planned.index]})
+    
+    if partial:
+        validation_message.append(f"Validation incomplete: deadline of {deadline.seconds:g}s exceeded")
+    
+    # Determine if the validation passed
+    is_valid = has_python_files and not validation_message
+    
+    result = {
+        "isValid": is_valid,
+        "message": "Validation successful" if is_valid else "Validation failed: " + "; ".join(validation_message),
+        "files_analyzed": file_analyses,
+        "ai_analysis": ai_analysis,
+        "ai_verdict": ai_verdict
+    }
+    if ai_error is not None:
+        result["ai_error"] = ai_error
+    if partial:
+        result["partial"] = True
+    if submission is not None:
+        if is_cacheable_result(result):
+            files = {
+                members[index].filename: {"sha256": sha256, "analysis": file_analyses[index]}
+                for index, sha256 in file_hashes.items()
+            }
+            submission["version"] = await io_executor.run(
+                submission_store.save, model_id, settings_key, is_valid, ai_verdict, files
+            )
+        result["submission"] = submission
+    elif is_cacheable_result(result):
+        await io_executor.run(submission_cache.set, digest, json.dumps(result))
+    await emit("verdict", result)
+    return result
+
+async def read_upload(file: UploadFile) -> Tuple[BinaryIO, str, int]:
+    return await take_upload(
+        file,
+        max_bytes=MAX_UPLOAD_BYTES,
+        chunk_size=UPLOAD_CHUNK_SIZE,
+        run_blocking=io_executor.run
+    )
+
+async def run_until_disconnected(request: Request, work: Awaitable[Dict]) -> Optional[Dict]:
+    """Await work, cancelling it if the client disconnects first; returns None in that case."""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                cancellation_counts["validations"] += 1
+                await asyncio.gather(task, return_exceptions=True)
+                return None
+    finally:
+        # Also covers the handler itself being cancelled
+        task.cancel()
+
+def request_tenant(request: Request) -> str:
+    """Tenant for fair scheduling; X-Tenant-ID only counts when TRUST_TENANT_HEADER is set."""
+    return tenant_from_headers(request.headers, TRUST_TENANT_HEADER)
+
+def request_deadline(deadline_seconds: Optional[float], header_timeout: Optional[float]) -> Deadline:
+    """Deadline from the form field, else the X-Request-Timeout header, else VALIDATION_TIMEOUT."""
+    seconds = deadline_seconds or header_timeout or VALIDATION_TIMEOUT
+    return Deadline(min(max(seconds, 0.0), MAX_VALIDATION_TIMEOUT))
+
+def invalid_filename_result() -> Dict:
+    return {
+        "isValid": False,
+        "message": "File must be a ZIP file",
+        "files_analyzed": [],
+        "ai_analysis": None
+    }
 
 @app.post("/process-zip")
 async def process_zip_file(
+    request: Request,
     file: UploadFile = File(...),
     description: str = Form(...),
-    setup: str = Form(...)
+    setup: str = Form(...),
+    deadline_seconds: Optional[float] = Form(None),
+    model_id: Optional[str] = Form(None),
+    x_request_timeout: Optional[float] = Header(None)
 ):
     if not file.filename.endswith('.zip'):
-        return {
-            "isValid": False,
-            "message": "File must be a ZIP file",
-            "files_analyzed": [],
-            "ai_analysis": None
-        }
+        return invalid_filename_result()
+    
+    deadline = request_deadline(deadline_seconds, x_request_timeout)
     
-    # Create a unique temporary directory
-    extract_dir = tempfile.mkdtemp(prefix="zip_analysis_")
+    # Size-check and hash the upload where Starlette spooled it
+    zip_file, upload_sha256, _ = await read_upload(file)
     
     try:
-        # Read the uploaded file
-        contents = await file.read()
-        
-        # Create a BytesIO object from the contents
-        zip_file = io.BytesIO(contents)
-        
-        # Extract the ZIP file
-        with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-        
-        # Analyze each extracted file
-        file_analyses = []
-        has_python_files = False
-        all_python_content = []
-        
-        for root, dirs, files in os.walk(extract_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                analysis = await analyze_file_content(file_path, description=description, setup=setup)
-                file_analyses.append(analysis)
-                
-                # Check for Python files
-                if file.endswith('.py'):
-                    has_python_files = True
-                    if 'content' in analysis:
-                        all_python_content.append(analysis['content'])
-        
-        # Basic validation rules
-        validation_message = []
-        if not has_python_files:
-            validation_message.append("No Python files found in the ZIP")
-        
-        # Get AI analysis of all Python files combined
-        ai_analysis = None
-        if all_python_content:
-            combined_content = "\n\n".join(all_python_content)
-            ai_analysis = await get_ai_analysis(combined_content, description, setup)
-            
-            # Only reject if AI explicitly says to reject
-            is_rejected = "❌ REJECT" in ai_analysis
-            if is_rejected:
-                validation_message.append("Code appears to be a placeholder or test code")
-        
-        # Determine if the validation passed
-        is_valid = has_python_files and not validation_message
-        
-        # Clean up the temporary directory
-        shutil.rmtree(extract_dir)
-        
-        return {
-            "isValid": is_valid,
-            "message": "Validation successful" if is_valid else "Validation failed: " + "; ".join(validation_message),
-            "files_analyzed": file_analyses,
-            "ai_analysis": ai_analysis
-        }
+        result = await run_until_disconnected(
+            request,
+            validate_archive(
+                zip_file, description, setup, deadline=deadline,
+                caller=Caller(request_tenant(request), INTERACTIVE), model_id=model_id,
+                upload_sha256=upload_sha256
+            )
+        )
+        if result is None:
+            # Nobody is listening; 499 is the conventional "client closed request" status
+            return Response(status_code=499)
+        return result
         
     except Exception as e:
-        # Clean up the temporary directory in case of error
-        if os.path.exists(extract_dir):
-            shutil.rmtree(extract_dir)
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        zip_file.close()
+
+def format_sse(event: str, payload: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+async def stream_validation(
+    zip_file: BinaryIO,
+    upload_sha256: str,
+    upload_size: int,
+    description: str,
+    setup: str,
+    deadline: Deadline,
+    stream_reasoning: bool = False,
+    caller: Optional[Caller] = None,
+    model_id: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Run validate_archive in the background and yield its stage events as SSE."""
+    events: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+    
+    async def on_event(event: str, payload: Dict) -> None:
+        await events.put(format_sse(event, payload))
+    
+    async def run() -> None:
+        try:
+            await validate_archive(
+                zip_file, description, setup, on_event=on_event, deadline=deadline,
+                stream_reasoning=stream_reasoning, caller=caller, model_id=model_id,
+                upload_sha256=upload_sha256
+            )
+        except Exception as e:
+            await events.put(format_sse("error", {"detail": str(e)}))
+        finally:
+            await events.put(None)
+    
+    task = asyncio.create_task(run())
+    try:
+        yield format_sse("upload_received", {"size": upload_size, "sha256": upload_sha256})
+        while True:
+            message = await events.get()
+            if message is None:
+                break
+            yield message
+    finally:
+        # Starlette stops the generator when the client disconnects mid-stream
+        if not task.done():
+            task.cancel()
+            cancellation_counts["validations"] += 1
+        # Let it unwind before the archive it reads from is closed
+        await asyncio.gather(task, return_exceptions=True)
+        zip_file.close()
+
+@app.post("/process-zip/stream")
+async def process_zip_file_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    description: str = Form(...),
+    setup: str = Form(...),
+    deadline_seconds: Optional[float] = Form(None),
+    stream_reasoning: bool = Form(False),
+    model_id: Optional[str] = Form(None),
+    x_request_timeout: Optional[float] = Header(None)
+):
+    if not file.filename.endswith('.zip'):
+        raise HTTPException(status_code=400, detail="File must be a ZIP file")
+    
+    deadline = request_deadline(deadline_seconds, x_request_timeout)
+    zip_file, upload_sha256, upload_size = await read_upload(file)
+    return StreamingResponse(
+        stream_validation(
+            zip_file, upload_sha256, upload_size, description, setup, deadline, stream_reasoning,
+            Caller(request_tenant(request), INTERACTIVE), model_id
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+async def run_validation_job(job: Dict) -> Dict:
+    """Job handler: validate the archive persisted for a queued job."""
+    zip_file = await io_executor.run(open, job["archive_path"], "rb")
+    with zip_file:
+        return await validate_archive(
+            zip_file, job["description"], job["setup"],
+            caller=Caller(job["tenant"] or DEFAULT_TENANT, BATCH)
+        )
+
+def persist_archive(zip_file: BinaryIO) -> str:
+    """Copy an upload into JOBS_DIR, returning its path."""
+    fd, archive_path = tempfile.mkstemp(prefix="job_", suffix=".zip", dir=JOBS_DIR)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(zip_file, out, UPLOAD_CHUNK_SIZE)
+    return archive_path
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    request: Request,
+    file: UploadFile = File(...),
+    description: str = Form(...),
+    setup: str = Form(...)
+):
+    if not file.filename.endswith('.zip'):
+        raise HTTPException(status_code=400, detail="File must be a ZIP file")
+    
+    # Persist the archive so the job can be resumed after a restart
+    zip_file, _, _ = await read_upload(file)
+    with zip_file:
+        archive_path = await io_executor.run(persist_archive, zip_file)
+    
+    job_id = await io_executor.run(
+        job_store.create, archive_path, description, setup, request_tenant(request)
+    )
+    job_pool.submit(job_id)
+    return {"job_id": job_id, "status": QUEUED}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "result": job["result"],
+        "error": job["error"]
+    }
+
+def read_manifest(zip_ref: zipfile.ZipFile) -> Dict:
+    """Per-archive settings from a zip of zips' manifest.json, if it has one."""
+    manifests = [
+        info for info in zip_ref.infolist()
+        if not info.is_dir() and os.path.basename(info.filename) == MANIFEST_NAME
+    ]
+    if not manifests:
+        return {}
+    info = min(manifests, key=lambda i: i.filename.count("/"))
+    if info.file_size > MAX_MANIFEST_BYTES:
+        raise ValueError(f"{info.filename} is larger than {MAX_MANIFEST_BYTES} bytes")
+    with open_guarded(zip_ref, info) as f:
+        manifest = json.loads(f.read().decode("utf-8"))
+    if not isinstance(manifest, dict):
+        raise ValueError(f"{info.filename} must be a JSON object keyed by archive name")
+    return manifest
+
+def expand_bundle(zip_file: BinaryIO) -> Optional[Tuple[zipfile.ZipFile, List[zipfile.ZipInfo], Dict]]:
+    """Open an upload as a zip of zips; None if it is an ordinary (or unreadable) archive."""
+    try:
+        zip_ref = zipfile.ZipFile(zip_file, 'r')
+    except zipfile.BadZipFile:
+        # Reported per item when the archive is validated
+        return None
+    try:
+        members = nested_archives(zip_ref)
+        if members is None:
+            zip_ref.close()
+            return None
+        check_archive(zip_ref, archive_limits)
+        return zip_ref, members, read_manifest(zip_ref)
+    except BaseException:
+        zip_ref.close()
+        raise
+    finally:
+        zip_file.seek(0)
+
+def extract_nested(zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo) -> Tuple[BinaryIO, str]:
+    """Copy a nested archive into a spooled temp file, returning it and its sha256."""
+    if info.file_size > MAX_UPLOAD_BYTES:
+        raise ArchiveRejected(f"{info.filename} exceeds the maximum archive size of {MAX_UPLOAD_BYTES} bytes")
+    spooled = SeekableSpooledFile(max_size=UPLOAD_SPOOL_MEMORY_BYTES)
+    digest = hashlib.sha256()
+    try:
+        with open_guarded(zip_ref, info) as f:
+            while True:
+                chunk = f.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled, digest.hexdigest()
+
+def close_batch(uploads: List[Tuple[BinaryIO, str]], bundles: Dict[int, zipfile.ZipFile]) -> None:
+    for zip_ref in bundles.values():
+        zip_ref.close()
+    for zip_file, _ in uploads:
+        zip_file.close()
+
+async def stream_batch(
+    items: List[BatchItem],
+    uploads: List[Tuple[BinaryIO, str]],
+    bundles: Dict[int, zipfile.ZipFile],
+    caller: Caller
+) -> AsyncIterator[str]:
+    """Validate batch items concurrently and yield one NDJSON line per item as it finishes.
+    
+    Items with the same archive content, description and setup are validated once.
+    A final line summarizes the batch.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    flights = SingleFlight()
+    first_seen: Dict[str, int] = {}
+    lines: "asyncio.Queue[str]" = asyncio.Queue()
+    summary = {"items": len(items), "valid": 0, "invalid": 0, "errors": 0, "duplicates": 0}
+    
+    async def run(item: BatchItem) -> None:
+        line = {"index": item.index, "name": item.name}
+        zip_file = None
+        try:
+            async with semaphore:
+                if item.member is None:
+                    zip_file, sha256 = uploads[item.upload]
+                else:
+                    zip_file, sha256 = await io_executor.run(extract_nested, bundles[item.upload], item.member)
+                line["sha256"] = sha256
+                key = make_cache_key(sha256, item.description, item.setup)
+                if key in first_seen:
+                    line["duplicate_of"] = first_seen[key]
+                    summary["duplicates"] += 1
+                else:
+                    first_seen[key] = item.index
+                archive = zip_file
+                result = await flights.do(
+                    key,
+                    lambda _: validate_archive(
+                        archive, item.description, item.setup, caller=caller, upload_sha256=sha256
+                    )
+                )
+            line["result"] = result
+            summary["valid" if result.get("isValid") else "invalid"] += 1
+        except Exception as e:
+            line["error"] = str(e)
+            summary["errors"] += 1
+        finally:
+            if item.member is not None and zip_file is not None:
+                zip_file.close()
+        await lines.put(format_ndjson(line))
+    
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    try:
+        for _ in tasks:
+            yield await lines.get()
+        yield format_ndjson({"summary": summary})
+    finally:
+        # Starlette stops the generator when the client disconnects mid-stream
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+                cancellation_counts["validations"] += 1
+        await asyncio.gather(*tasks, return_exceptions=True)
+        close_batch(uploads, bundles)
+
+@app.post("/batch")
+async def validate_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    items: Optional[str] = Form(None),
+    description: str = Form(""),
+    setup: str = Form("")
+):
+    """Validate many archives, streaming NDJSON results as each one completes.
+    
+    Each upload is a model archive or a zip of zips. Per-archive description/setup
+    come from items (a JSON list in archive order, or an object keyed by archive
+    name), else a zip of zips' manifest.json, else the batch-wide fields.
+    """
+    if len(files) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {MAX_BATCH_ITEMS} archives")
+    if not all(file.filename.endswith('.zip') for file in files):
+        raise HTTPException(status_code=400, detail="Every file must be a ZIP file")
+    try:
+        settings = parse_item_settings(items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid items: {e}")
+    
+    uploads: List[Tuple[BinaryIO, str]] = []
+    bundles: Dict[int, zipfile.ZipFile] = {}
+    batch_items: List[BatchItem] = []
+    try:
+        for upload_index, file in enumerate(files):
+            zip_file, sha256, _ = await read_upload(file)
+            uploads.append((zip_file, sha256))
+            bundle = await io_executor.run(expand_bundle, zip_file)
+            if bundle is None:
+                batch_items.append(BatchItem(len(batch_items), file.filename, upload_index, description, setup))
+                continue
+            zip_ref, members, manifest = bundle
+            bundles[upload_index] = zip_ref
+            nested = [
+                BatchItem(len(batch_items) + i, info.filename, upload_index, description, setup, member=info)
+                for i, info in enumerate(members)
+            ]
+            apply_settings(nested, manifest)
+            batch_items.extend(nested)
+        if len(batch_items) > MAX_BATCH_ITEMS:
+            raise HTTPException(status_code=400, detail=f"A batch may contain at most {MAX_BATCH_ITEMS} archives")
+        apply_settings(batch_items, settings)
+    except BaseException as e:
+        close_batch(uploads, bundles)
+        if isinstance(e, (ValueError, ArchiveRejected)):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
+    
+    # CI batches run in the batch lane so they never delay interactive uploads
+    caller = Caller(request_tenant(request), BATCH)
+    return StreamingResponse(
+        stream_batch(batch_items, uploads, bundles, caller),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
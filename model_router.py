@@ -0,0 +1,244 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from circuit_breaker import CircuitBreaker
+from retry import LLMCallError
+
+# Failures that say nothing about the model's health
+NEUTRAL_ERROR_KINDS = {"deadline_exceeded"}
+
+
+class ModelConfig:
+    """One model in the pool, with its own concurrency limit and timeouts."""
+
+    def __init__(self, name: str, max_concurrency: int, connect_timeout: float, read_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+
+def parse_model_pool(spec: str, fallbacks: List[str], default: ModelConfig) -> List[ModelConfig]:
+    """Build the pool from a JSON list of model objects, or from default plus fallback names.
+
+    Each JSON entry needs "name"; "max_concurrency", "connect_timeout" and
+    "read_timeout" default to the values of default. The first entry is the primary.
+    """
+    if not spec.strip():
+        return [default] + [
+            ModelConfig(name, default.max_concurrency, default.connect_timeout, default.read_timeout)
+            for name in fallbacks if name != default.name
+        ]
+    entries = json.loads(spec)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("LLM_MODEL_POOL must be a non-empty JSON list")
+    return [
+        ModelConfig(
+            entry["name"],
+            int(entry.get("max_concurrency", default.max_concurrency)),
+            float(entry.get("connect_timeout", default.connect_timeout)),
+            float(entry.get("read_timeout", default.read_timeout))
+        )
+        for entry in entries
+    ]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ModelHealth:
+    """Rolling outcomes and latencies of one model over a time window."""
+
+    def __init__(self, window_seconds: float, max_samples: int = 200):
+        self.window_seconds = window_seconds
+        # (finished at, succeeded, latency in seconds)
+        self.samples: Deque[Tuple[float, bool, float]] = deque(maxlen=max_samples)
+        self.in_flight = 0
+
+    def record(self, succeeded: bool, latency: float) -> None:
+        self.samples.append((time.monotonic(), succeeded, latency))
+
+    def recent(self) -> List[Tuple[float, bool, float]]:
+        cutoff = time.monotonic() - self.window_seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return list(self.samples)
+
+    def error_rate(self) -> Optional[float]:
+        samples = self.recent()
+        if not samples:
+            return None
+        return sum(1 for _, succeeded, _ in samples if not succeeded) / len(samples)
+
+    def latency(self, fraction: float) -> Optional[float]:
+        latencies = [latency for _, succeeded, latency in self.recent() if succeeded]
+        return percentile(latencies, fraction) if latencies else None
+
+
+class ModelRouter:
+    """Pick the fastest healthy model for each call, falling back down the pool on failure.
+
+    Models are ranked healthy first (error rate under max_error_rate once min_samples
+    outcomes are in the window), then by median latency, then by pool order; models
+    with no latency yet rank after measured ones. With hedging enabled, a call still
+    running after hedge_delay (or the model's p95 latency once measured, if lower) is
+    raced against the next model and the first answer wins.
+
+    Each model also has a circuit breaker: models whose breaker is open are skipped,
+    and when every breaker is open the call fails fast with a circuit_open error.
+    """
+
+    def __init__(
+        self,
+        models: List[ModelConfig],
+        window_seconds: float = 300.0,
+        min_samples: int = 5,
+        max_error_rate: float = 0.5,
+        hedging: bool = False,
+        hedge_delay: float = 30.0,
+        breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker
+    ):
+        self.models = models
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.hedging = hedging
+        self.hedge_delay = hedge_delay
+        self.health = {model.name: ModelHealth(window_seconds) for model in models}
+        self.breakers = {model.name: breaker_factory() for model in models}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.fallbacks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @property
+    def key(self) -> str:
+        """Identifies the pool in cache keys: any of its models may answer a prompt."""
+        return ",".join(model.name for model in self.models)
+
+    def semaphore(self, model: ModelConfig) -> asyncio.Semaphore:
+        # Created lazily inside the running loop: before Python 3.10 a semaphore binds to the loop it is created in
+        if model.name not in self._semaphores:
+            self._semaphores[model.name] = asyncio.Semaphore(model.max_concurrency)
+        return self._semaphores[model.name]
+
+    def reset_limits(self) -> None:
+        self._semaphores.clear()
+
+    def healthy(self, model: ModelConfig) -> bool:
+        health = self.health[model.name]
+        if len(health.recent()) < self.min_samples:
+            return True
+        return health.error_rate() < self.max_error_rate
+
+    def candidates(self) -> List[ModelConfig]:
+        def rank(item: Tuple[int, ModelConfig]):
+            index, model = item
+            latency = self.health[model.name].latency(0.5)
+            return (not self.healthy(model), latency is None, latency or 0.0, index)
+        return [model for _, model in sorted(enumerate(self.models), key=rank)]
+
+    def hedge_after(self, model: ModelConfig) -> float:
+        health = self.health[model.name]
+        p95 = health.latency(0.95) if len(health.recent()) >= self.min_samples else None
+        return self.hedge_delay if p95 is None else min(self.hedge_delay, p95)
+
+    async def call(self, attempt: Callable[[ModelConfig, bool], Awaitable[str]]) -> str:
+        """Run attempt(model, primary) on the best model, then on the next ones as needed.
+
+        primary is True only for the first model tried. Raises the last LLMCallError
+        once every model has failed; a deadline_exceeded error is raised at once.
+        """
+        queue = self.candidates()
+        running: Dict["asyncio.Future", ModelConfig] = {}
+        launched: List["asyncio.Future"] = []
+        last_error: Optional[LLMCallError] = None
+
+        def launch() -> bool:
+            while queue:
+                model = queue.pop(0)
+                if self.breakers[model.name].allow():
+                    task = asyncio.ensure_future(self._timed(model, attempt, primary=not launched))
+                    running[task] = model
+                    launched.append(task)
+                    return True
+            return False
+
+        if not launch():
+            raise LLMCallError("circuit_open", "Analysis unavailable: the circuit breaker is open for every model")
+        try:
+            while running:
+                hedge_timeout = None
+                if self.hedging and queue and len(running) == 1:
+                    hedge_timeout = self.hedge_after(next(iter(running.values())))
+                done, _ = await asyncio.wait(running, timeout=hedge_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if launch():
+                        self.hedges += 1
+                    continue
+                for task in done:
+                    running.pop(task)
+                    try:
+                        result = task.result()
+                    except LLMCallError as e:
+                        if e.kind in NEUTRAL_ERROR_KINDS:
+                            raise
+                        last_error = e
+                        continue
+                    if task is not launched[0] and launched[0] in running:
+                        self.hedge_wins += 1
+                    return result
+                if not running and launch():
+                    self.fallbacks += 1
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def _timed(self, model: ModelConfig, attempt: Callable[[ModelConfig, bool], Awaitable[str]], primary: bool) -> str:
+        health = self.health[model.name]
+        breaker = self.breakers[model.name]
+        started = time.monotonic()
+        health.in_flight += 1
+        try:
+            result = await attempt(model, primary)
+        except LLMCallError as e:
+            if e.kind in NEUTRAL_ERROR_KINDS:
+                breaker.release()
+            else:
+                health.record(False, time.monotonic() - started)
+                breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (e.g. a hedge that lost) or a bug: neither says anything about the model
+            breaker.release()
+            raise
+        finally:
+            health.in_flight -= 1
+        health.record(True, time.monotonic() - started)
+        breaker.record_success()
+        return result
+
+    def stats(self) -> Dict:
+        models = {}
+        for model in self.models:
+            health = self.health[model.name]
+            models[model.name] = {
+                "healthy": self.healthy(model),
+                "samples": len(health.recent()),
+                "error_rate": health.error_rate(),
+                "p50_latency": health.latency(0.5),
+                "p95_latency": health.latency(0.95),
+                "in_flight": health.in_flight,
+                "circuit": self.breakers[model.name].stats()
+            }
+        return {
+            "models": models,
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins
+        }
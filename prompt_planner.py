@@ -0,0 +1,191 @@
+import ast
+import math
+import os
+import re
+from typing import List
+
+# File names that usually hold the model's entrypoint, analyzed first
+ENTRYPOINT_NAMES = (
+    "main.py", "__main__.py", "app.py", "train.py", "inference.py", "predict.py",
+    "model.py", "run.py", "serve.py", "pipeline.py"
+)
+
+FILE_HEADER = "### File: {path}"
+
+# Description words too common to say anything about which file is relevant
+STOP_WORDS = {"this", "that", "with", "from", "model", "code", "file", "files", "uses", "using", "will", "into"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: ~4 characters per token for code and English."""
+    return math.ceil(len(text) / 4)
+
+
+class PlannedFile:
+    """A file, or one chunk of a large file, to be placed in a prompt."""
+
+    def __init__(self, index: int, path: str, content: str, part: int = 1, parts: int = 1):
+        self.index = index
+        self.path = path
+        self.content = content
+        self.part = part
+        self.parts = parts
+        self.tokens = estimate_tokens(self.render())
+        self.priority = 0
+
+    @property
+    def label(self) -> str:
+        """Path shown in the prompt header and expected back in the findings."""
+        return self.path if self.parts == 1 else f"{self.path} (part {self.part} of {self.parts})"
+
+    def render(self) -> str:
+        return FILE_HEADER.format(path=self.label) + "\n" + self.content
+
+    def split(self, max_tokens: int) -> List["PlannedFile"]:
+        """Split into chunks whose rendered size fits max_tokens, on AST boundaries for Python."""
+        overhead = estimate_tokens(FILE_HEADER.format(path=f"{self.path} (part 999 of 999)") + "\n")
+        if self.path.endswith(".py"):
+            chunks = chunk_python_source(self.content, max_tokens - overhead)
+        else:
+            chunks = chunk_lines(self.content.splitlines(keepends=True), max_tokens - overhead)
+        return [
+            PlannedFile(self.index, self.path, chunk, part=i + 1, parts=len(chunks))
+            for i, chunk in enumerate(chunks)
+        ]
+
+
+def chunk_lines(lines: List[str], max_tokens: int) -> List[str]:
+    """Group lines into chunks of at most max_tokens, hard-splitting any single oversized line."""
+    max_chars = max(1, max_tokens * 4)
+    chunks: List[str] = []
+    current = ""
+    for line in lines:
+        while len(line) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and len(current) + len(line) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += line
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_python_source(source: str, max_tokens: int) -> List[str]:
+    """Split Python source into chunks of whole top-level statements where possible.
+
+    Top-level functions and classes (with their decorators) are kept together; a
+    single statement larger than max_tokens falls back to line-based splitting.
+    Unparseable source is split by lines.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return chunk_lines(source.splitlines(keepends=True), max_tokens)
+
+    lines = source.splitlines(keepends=True)
+    # Each top-level node spans from its first decorator to the line before the next node
+    starts = [
+        min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])]) - 1
+        for node in tree.body
+    ]
+    if not starts:
+        return chunk_lines(lines, max_tokens)
+    starts[0] = 0
+    bounds = list(zip(starts, starts[1:] + [len(lines)]))
+
+    max_chars = max_tokens * 4
+    chunks: List[str] = []
+    current = ""
+    for start, end in bounds:
+        block = "".join(lines[start:end])
+        if len(block) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(chunk_lines(lines[start:end], max_tokens))
+            continue
+        if current and len(current) + len(block) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += block
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def description_keywords(description: str) -> set:
+    words = re.findall(r"[a-zA-Z_][a-zA-Z0-9_]{3,}", description.lower())
+    return {word for word in words if word not in STOP_WORDS}
+
+
+def file_priority(path: str, keywords: set) -> int:
+    """Higher is analyzed earlier: entrypoints first, then files named like the description."""
+    name = os.path.basename(path).lower()
+    priority = 0
+    if name in ENTRYPOINT_NAMES:
+        priority += 10
+    if name.endswith(".py"):
+        priority += 2
+    path_words = set(re.findall(r"[a-z0-9]+", path.lower()))
+    priority += 3 * len(path_words & keywords)
+    # Shallow files are more likely to be the top-level code than deep helpers
+    priority -= path.count("/")
+    return priority
+
+
+def plan_packs(files: List[PlannedFile], budget_tokens: int, description: str = "") -> List[List[PlannedFile]]:
+    """Pack files into as few prompts as fit budget_tokens each.
+
+    Files are placed in priority order with first-fit, so entrypoints and files
+    matching the description land in the first pack. A file larger than the
+    whole budget is split into chunks that are packed like separate files.
+    """
+    keywords = description_keywords(description)
+    pieces: List[PlannedFile] = []
+    for planned in files:
+        if planned.tokens > budget_tokens:
+            pieces.extend(planned.split(budget_tokens))
+        else:
+            pieces.append(planned)
+    for piece in pieces:
+        piece.priority = file_priority(piece.path, keywords)
+
+    packs: List[List[PlannedFile]] = []
+    pack_tokens: List[int] = []
+    for planned in sorted(pieces, key=lambda f: (-f.priority, f.index, f.part)):
+        for i, used in enumerate(pack_tokens):
+            if used + planned.tokens <= budget_tokens:
+                packs[i].append(planned)
+                pack_tokens[i] += planned.tokens
+                break
+        else:
+            packs.append([planned])
+            pack_tokens.append(planned.tokens)
+    return packs
+
+
+def render_pack(pack: List[PlannedFile]) -> str:
+    return "\n\n".join(planned.render() for planned in pack)
+
+
+def group_by_budget(texts: List[str], budget_tokens: int, separator: str = "\n\n") -> List[List[str]]:
+    """Split texts, in order, into consecutive groups whose joined size fits budget_tokens.
+
+    A text larger than the budget on its own still gets a group of its own.
+    """
+    groups: List[List[str]] = []
+    used = 0
+    for text in texts:
+        tokens = estimate_tokens(separator + text)
+        if groups and used + tokens <= budget_tokens:
+            groups[-1].append(text)
+            used += tokens
+        else:
+            groups.append([text])
+            used = tokens
+    return groups
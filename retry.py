@@ -0,0 +1,113 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+# Statuses worth retrying: timeouts, rate limits and transient upstream failures
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class LLMCallError(Exception):
+    """Structured failure of an upstream LLM call, surfaced once retries are exhausted."""
+
+    def __init__(self, kind: str, message: str, status_code: Optional[int] = None, attempts: int = 0):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+        self.status_code = status_code
+        self.attempts = attempts
+
+    def to_dict(self) -> Dict:
+        return {
+            "error": self.kind,
+            "message": self.message,
+            "status_code": self.status_code,
+            "attempts": self.attempts
+        }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given as delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """Decorrelated-jitter backoff bounded by an attempt count and a total time budget."""
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        total_timeout: float = 60.0
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.total_timeout = total_timeout
+
+    def next_delay(self, previous_delay: float) -> float:
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3)))
+
+
+async def send_with_retry(
+    send: Callable[[], Awaitable[httpx.Response]],
+    policy: RetryPolicy,
+    deadline: Optional[float] = None
+) -> httpx.Response:
+    """Call send until it returns a 2xx response, retrying transient failures.
+
+    deadline is an absolute time.monotonic() value; it defaults to policy.total_timeout
+    from now. Raises LLMCallError once the response is not retryable, attempts run out,
+    or the next wait would overrun the deadline.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + policy.total_timeout
+    delay = policy.base_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        retry_after = None
+        try:
+            response = await send()
+        except httpx.TransportError as e:
+            error = LLMCallError("network_error", f"Request to upstream failed: {e!r}", attempts=attempt)
+        else:
+            if response.is_success:
+                return response
+            status_code = response.status_code
+            if status_code not in RETRYABLE_STATUS_CODES:
+                raise LLMCallError(
+                    "upstream_error",
+                    f"API returned status code {status_code}",
+                    status_code=status_code,
+                    attempts=attempt
+                )
+            kind = "rate_limited" if status_code == 429 else "upstream_unavailable"
+            error = LLMCallError(kind, f"API returned status code {status_code}", status_code=status_code, attempts=attempt)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+        if attempt >= policy.max_attempts:
+            raise error
+
+        delay = policy.next_delay(delay)
+        wait = max(delay, retry_after or 0.0)
+        if time.monotonic() + wait > deadline:
+            error.message = f"{error.message}; retry budget exhausted"
+            error.args = (error.message,)
+            raise error
+        await asyncio.sleep(wait)
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import heapq
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Mapping, Optional, Tuple
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# Lanes in the order they are served: batch calls only start when no interactive call is waiting
+PRIORITIES = (INTERACTIVE, BATCH)
+
+DEFAULT_TENANT = "anonymous"
+# Finish tags of idle tenants are dropped once this many are tracked per lane, and the wait
+# stats of the least recently seen tenants once this many are tracked overall
+MAX_TRACKED_TENANTS = 1024
+
+
+class Caller:
+    """Who an LLM call is made for: the tenant it is charged to and its priority lane."""
+
+    def __init__(self, tenant: str = DEFAULT_TENANT, priority: str = INTERACTIVE):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        self.tenant = tenant
+        self.priority = priority
+
+
+def tenant_from_headers(headers: Mapping[str, str], trust_tenant_header: bool = False) -> str:
+    """Identify the tenant from the API key, else from X-Tenant-ID when that header is trusted.
+
+    X-Tenant-ID is free-form, so a client rotating it would get a fresh fair-queueing
+    start on every call; only trust it when a gateway in front sets it. API keys are
+    hashed so they never show up in metrics.
+    """
+    api_key = headers.get("x-api-key", "").strip()
+    authorization = headers.get("authorization", "")
+    if not api_key and authorization.lower().startswith("bearer "):
+        api_key = authorization[len("bearer "):].strip()
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:12]
+    tenant = headers.get("x-tenant-id", "").strip() if trust_tenant_header else ""
+    if tenant:
+        return tenant[:64]
+    return DEFAULT_TENANT
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "tenant=weight,tenant=weight" into a dict."""
+    weights = {}
+    for item in spec.split(","):
+        if "=" in item:
+            tenant, weight = item.split("=", 1)
+            weights[tenant.strip()] = float(weight)
+    return weights
+
+
+class _Lane:
+    def __init__(self):
+        # (finish tag, sequence, waiter, tenant, enqueued at)
+        self.heap: List[Tuple[float, int, "asyncio.Future", str, float]] = []
+        self.virtual_time = 0.0
+        self.finish_tags: Dict[str, float] = {}
+
+
+class FairScheduler:
+    """Share a fixed number of concurrent LLM calls fairly between tenants.
+
+    Within each priority lane, waiting calls are ordered by weighted fair queueing:
+    each call gets a virtual finish tag of max(lane virtual time, the tenant's last
+    tag) + 1 / weight, so a tenant with many queued calls is interleaved with the
+    others instead of being served first-come-first-served. The interactive lane
+    is always served before the batch lane.
+    """
+
+    def __init__(self, capacity: int, weights: Optional[Dict[str, float]] = None, default_weight: float = 1.0):
+        self.capacity = capacity
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self.active = 0
+        self.lanes = {priority: _Lane() for priority in PRIORITIES}
+        self._sequence = 0
+        # tenant -> [calls, total queue wait in seconds, max queue wait], least recently seen first
+        self.tenant_waits: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def _waiting(self) -> int:
+        return sum(len(lane.heap) for lane in self.lanes.values())
+
+    def _record_wait(self, tenant: str, waited: float) -> None:
+        stats = self.tenant_waits.setdefault(tenant, [0, 0.0, 0.0])
+        self.tenant_waits.move_to_end(tenant)
+        while len(self.tenant_waits) > MAX_TRACKED_TENANTS:
+            self.tenant_waits.popitem(last=False)
+        stats[0] += 1
+        stats[1] += waited
+        stats[2] = max(stats[2], waited)
+
+    async def acquire(self, caller: Caller) -> None:
+        if self.active < self.capacity and self._waiting() == 0:
+            self.active += 1
+            self._record_wait(caller.tenant, 0.0)
+            return
+
+        lane = self.lanes[caller.priority]
+        if len(lane.finish_tags) > MAX_TRACKED_TENANTS:
+            lane.finish_tags = {t: tag for t, tag in lane.finish_tags.items() if tag > lane.virtual_time}
+        weight = self.weights.get(caller.tenant, self.default_weight)
+        tag = max(lane.virtual_time, lane.finish_tags.get(caller.tenant, 0.0)) + 1.0 / weight
+        lane.finish_tags[caller.tenant] = tag
+        future = asyncio.get_running_loop().create_future()
+        self._sequence += 1
+        entry = (tag, self._sequence, future, caller.tenant, time.monotonic())
+        heapq.heappush(lane.heap, entry)
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller went away: pass the slot on
+                self.release()
+            elif entry in lane.heap:
+                lane.heap.remove(entry)
+                heapq.heapify(lane.heap)
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        for priority in PRIORITIES:
+            lane = self.lanes[priority]
+            while lane.heap:
+                tag, _, future, tenant, enqueued_at = heapq.heappop(lane.heap)
+                if future.done():
+                    continue
+                lane.virtual_time = tag
+                self.active += 1
+                self._record_wait(tenant, time.monotonic() - enqueued_at)
+                future.set_result(None)
+                return
+
+    @asynccontextmanager
+    async def slot(self, caller: Optional[Caller] = None) -> AsyncIterator[None]:
+        caller = caller or Caller()
+        await self.acquire(caller)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "waiting": {priority: len(lane.heap) for priority, lane in self.lanes.items()},
+            "tenants": {
+                tenant: {"calls": int(calls), "average_wait": total / calls, "max_wait": longest}
+                for tenant, (calls, total, longest) in self.tenant_waits.items()
+            }
+        }
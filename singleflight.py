@@ -0,0 +1,68 @@
+import asyncio
+import math
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from deadline import Deadline
+
+
+class _Call:
+    def __init__(self, deadline: Deadline):
+        self.task: Optional["asyncio.Future"] = None
+        self.deadline = deadline
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one shared upstream call.
+
+    Every waiter gets the same result or the same exception. A waiter being
+    cancelled only detaches it; the shared call is cancelled once no waiters remain.
+
+    fn is given the shared call's deadline: the latest of its waiters' deadlines,
+    extended as waiters join, and unbounded once any waiter has none. Each waiter
+    only waits until its own deadline, then gets asyncio.TimeoutError while the
+    call carries on for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[Deadline], Awaitable[Any]], deadline: Optional[Deadline] = None) -> Any:
+        own_deadline = deadline or Deadline(math.inf)
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(Deadline(own_deadline.remaining()))
+            call.task = asyncio.ensure_future(fn(call.deadline))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+            self.leaders += 1
+        else:
+            call.deadline.extend_to(own_deadline)
+            self.followers += 1
+
+        call.waiters += 1
+        try:
+            if deadline is None:
+                return await asyncio.shield(call.task)
+            return await asyncio.wait_for(asyncio.shield(call.task), deadline.remaining())
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # The last interested caller went away
+                call.task.cancel()
+
+    def _finish(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every waiter was cancelled
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def stats(self) -> Dict:
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "in_flight": len(self._calls)
+        }
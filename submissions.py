@@ -0,0 +1,118 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+
+class SubmissionStore:
+    """SQLite-backed history of validated submissions per model, with per-file hashes.
+
+    Only the latest version's files are kept; earlier versions keep their verdict.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS submissions ("
+                "model_id TEXT NOT NULL, version INTEGER NOT NULL, settings_key TEXT NOT NULL, "
+                "is_valid INTEGER NOT NULL, verdict TEXT, created_at REAL NOT NULL, "
+                "PRIMARY KEY (model_id, version))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS submission_files ("
+                "model_id TEXT NOT NULL, path TEXT NOT NULL, sha256 TEXT NOT NULL, analysis TEXT NOT NULL, "
+                "PRIMARY KEY (model_id, path))"
+            )
+
+    def latest(self, model_id: str) -> Optional[Dict]:
+        """The latest submission with its files as {path: {"sha256", "analysis"}}, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM submissions WHERE model_id = ? ORDER BY version DESC LIMIT 1",
+                (model_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            files = self._conn.execute(
+                "SELECT path, sha256, analysis FROM submission_files WHERE model_id = ?",
+                (model_id,)
+            ).fetchall()
+        submission = dict(row)
+        submission["verdict"] = json.loads(submission["verdict"]) if submission["verdict"] else None
+        submission["files"] = {
+            f["path"]: {"sha256": f["sha256"], "analysis": json.loads(f["analysis"])} for f in files
+        }
+        return submission
+
+    def save(self, model_id: str, settings_key: str, is_valid: bool, verdict: Optional[Dict], files: Dict[str, Dict]) -> int:
+        """Record a new version with its files, replacing the previous files; returns the version."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM submissions WHERE model_id = ?", (model_id,)
+            ).fetchone()
+            version = row[0] + 1
+            self._conn.execute(
+                "INSERT INTO submissions (model_id, version, settings_key, is_valid, verdict, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (model_id, version, settings_key, int(is_valid), json.dumps(verdict) if verdict else None, time.time())
+            )
+            self._conn.execute("DELETE FROM submission_files WHERE model_id = ?", (model_id,))
+            self._conn.executemany(
+                "INSERT INTO submission_files (model_id, path, sha256, analysis) VALUES (?, ?, ?, ?)",
+                [(model_id, path, f["sha256"], json.dumps(f["analysis"])) for path, f in files.items()]
+            )
+        return version
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def hash_member(open_member: Callable[[], BinaryIO], chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open_member() as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def diff_summary(
+    previous: Dict,
+    changed: List[str],
+    added: List[str],
+    removed: List[str],
+    unchanged: Dict[str, str],
+    max_chars: int
+) -> str:
+    """Describe what changed since the previous version, for the verdict prompt.
+
+    unchanged maps each unchanged file to its earlier finding; the listing is cut
+    off once max_chars is reached.
+    """
+    verdict = previous.get("verdict") or {}
+    lines = [f"## Changes since the previous submission (version {previous['version']})"]
+    if verdict.get("verdict"):
+        lines.append(f"Previous verdict: {verdict['verdict']}")
+        lines.extend(f"- {reason}" for reason in verdict.get("reasons", []))
+    lines.append("Changed files (included below): " + (", ".join(changed) or "none"))
+    lines.append("Added files (included below): " + (", ".join(added) or "none"))
+    lines.append("Removed files: " + (", ".join(removed) or "none"))
+    if unchanged:
+        lines.append("Unchanged files, not included, with their earlier findings:")
+    text = "\n".join(lines)
+    for path, finding in unchanged.items():
+        line = f"\n- {path}: {finding or 'no finding'}"
+        if len(text) + len(line) > max_chars:
+            text += "\n- ... (more unchanged files omitted)"
+            break
+        text += line
+    return text
@@ -0,0 +1,140 @@
+import hashlib
+import io
+import tempfile
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class SeekableSpooledFile(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile that zipfile can open members of on every supported Python.
+
+    Before Python 3.11 the class has no seekable(), which zipfile needs for reading
+    members; the spool is always seekable, in memory or rolled over to disk.
+    """
+
+    def seekable(self) -> bool:
+        return True
+
+
+class UploadSizeLimitMiddleware:
+    """Reject request bodies over max_bytes before they are fully received.
+
+    Declared Content-Length is checked up front; chunked bodies are counted as
+    they arrive and answered with 413 as soon as the limit is crossed. path_limits
+    overrides max_bytes for specific paths.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope["path"], self.max_bytes)
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        response_started = False
+        rejected = False
+        answered = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, rejected, answered
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Stop delivering the body: the app sees the client as gone, and the
+                    # 413 goes out here since errors raised while parsing the form become 400s
+                    rejected = True
+                    if not response_started:
+                        answered = True
+                        await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if answered:
+                # The 413 has already been sent
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, tracking_send)
+
+    async def _reject(self, send: Send) -> None:
+        body = b'{"detail":"Upload exceeds the maximum allowed size"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def take_upload(
+    file: UploadFile,
+    max_bytes: int,
+    chunk_size: int = 1024 * 1024,
+    run_blocking: Optional[Callable[..., Awaitable[Any]]] = None
+) -> Tuple[BinaryIO, str, int]:
+    """Size-check and hash the file Starlette already spooled, and take it over from the form.
+
+    Returns the file rewound to the start, its sha256 hex digest and its size; the caller
+    closes it. Raises a 413 HTTPException when it exceeds max_bytes. When run_blocking is
+    given, seeking and hashing (which hit disk once the spool rolled over) go through it.
+    """
+    def measure() -> int:
+        size = file.file.seek(0, io.SEEK_END)
+        file.file.seek(0)
+        return size
+
+    size = await run_blocking(measure) if run_blocking is not None else measure()
+    if size > max_bytes:
+        raise HTTPException(status_code=413, detail="Upload exceeds the maximum allowed size")
+    spooled = file.file
+    # The form closes its files once the endpoint returns, before a streaming body runs
+    file.file = io.BytesIO()
+    if not hasattr(spooled, "seekable"):
+        # zipfile needs seekable(), which SpooledTemporaryFile lacks before Python 3.11
+        spooled.seekable = lambda: True
+    try:
+        if run_blocking is not None:
+            sha256 = await run_blocking(hash_file, spooled, chunk_size)
+        else:
+            sha256 = hash_file(spooled, chunk_size)
+    except BaseException:
+        spooled.close()
+        raise
+    return spooled, sha256, size
+
+
+def hash_file(f: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """sha256 hex digest of a file object's content; leaves it rewound to the start."""
+    digest = hashlib.sha256()
+    f.seek(0)
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+    f.seek(0)
+    return digest.hexdigest()
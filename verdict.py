@@ -0,0 +1,126 @@
+import json
+import re
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+# Reasoning models may wrap their chain of thought in <think> tags before the answer
+THINK_PATTERN = re.compile(r"<think>.*?(</think>|$)", re.DOTALL)
+MARKED_VERDICT_PATTERN = re.compile(r"(✅\s*PUBLISH|❌\s*REJECT|\"?verdict\"?\s*[:=]\s*\"?(PUBLISH|REJECT))", re.IGNORECASE)
+BARE_VERDICT_PATTERN = re.compile(r"\b(PUBLISH|REJECT)\b")
+
+
+class CriterionScores(BaseModel):
+    code_quality: int = Field(ge=0, le=10)
+    documentation: int = Field(ge=0, le=10)
+    consistency: int = Field(ge=0, le=10)
+
+
+class FileFinding(BaseModel):
+    path: str
+    finding: str
+
+
+class Verdict(BaseModel):
+    verdict: Literal["PUBLISH", "REJECT"]
+    confidence: Optional[float] = Field(default=None, ge=0, le=1)
+    scores: Optional[CriterionScores] = None
+    reasons: List[str] = []
+    files: List[FileFinding] = []
+    # False when the verdict came from the keyword fallback rather than valid JSON
+    structured: bool = True
+
+    @property
+    def is_rejected(self) -> bool:
+        return self.verdict == "REJECT"
+
+    def summary_text(self) -> str:
+        """Short human-readable form, kept in ai_analysis for existing clients."""
+        mark = "❌ REJECT" if self.is_rejected else "✅ PUBLISH"
+        if self.confidence is not None:
+            mark += f" (confidence {self.confidence:.2f})"
+        return "\n".join([mark] + [f"- {reason}" for reason in self.reasons])
+
+
+class PartReview(BaseModel):
+    """Map-stage output for one part of a large repository."""
+    files: List[FileFinding] = []
+    summary: str
+
+
+def strip_reasoning(text: str) -> str:
+    return THINK_PATTERN.sub("", text)
+
+
+def json_objects(text: str) -> List[Dict]:
+    """Every top-level JSON object embedded in text, in order (code fences and prose are skipped)."""
+    decoder = json.JSONDecoder()
+    objects = []
+    position = text.find("{")
+    while position != -1:
+        try:
+            value, end = decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            position = text.find("{", position + 1)
+            continue
+        if isinstance(value, dict):
+            objects.append(value)
+        position = text.find("{", end)
+    return objects
+
+
+def structured_verdict(candidate: Dict) -> Optional[Verdict]:
+    if isinstance(candidate.get("verdict"), str):
+        candidate["verdict"] = candidate["verdict"].strip().upper()
+    try:
+        return Verdict.model_validate(candidate)
+    except ValidationError:
+        return None
+
+
+def parse_verdict(text: str) -> Verdict:
+    """Parse a verdict from the model's JSON, falling back to PUBLISH/REJECT keywords.
+
+    As before structured output, a response without an explicit REJECT is treated as PUBLISH.
+    """
+    text = strip_reasoning(text)
+    for candidate in reversed(json_objects(text)):
+        verdict = structured_verdict(candidate)
+        if verdict is not None:
+            return verdict
+
+    marked = MARKED_VERDICT_PATTERN.findall(text)
+    if marked:
+        verdict = "REJECT" if "REJECT" in marked[-1][0].upper() else "PUBLISH"
+    else:
+        bare = BARE_VERDICT_PATTERN.findall(text)
+        verdict = bare[-1] if bare else "PUBLISH"
+    return Verdict(verdict=verdict, structured=False)
+
+
+def parse_part_review(text: str) -> PartReview:
+    """Parse a map-stage response, using the raw text as the summary if it is not valid JSON."""
+    text = strip_reasoning(text)
+    for candidate in reversed(json_objects(text)):
+        try:
+            return PartReview.model_validate(candidate)
+        except ValidationError:
+            continue
+    return PartReview(summary=text.strip())
+
+
+def findings_by_path(files: List[FileFinding]) -> Dict[str, str]:
+    return {item.path.strip().strip("`"): item.finding for item in files}
+
+
+def has_structured_result(text: str) -> bool:
+    """True once text holds a complete JSON verdict or part review outside any reasoning."""
+    for candidate in json_objects(strip_reasoning(text)):
+        if structured_verdict(candidate) is not None:
+            return True
+        try:
+            PartReview.model_validate(candidate)
+            return True
+        except ValidationError:
+            continue
+    return False
@@ -0,0 +1,82 @@
+import fnmatch
+import mimetypes
+import os
+import zipfile
+from typing import Dict, Iterable, Optional
+
+# Directories that never contain code worth analyzing
+DEFAULT_SKIP_DIRECTORIES = (
+    "__MACOSX", ".git", ".hg", ".svn", "venv", ".venv", "site-packages",
+    "node_modules", "__pycache__", ".ipynb_checkpoints", ".mypy_cache", ".pytest_cache", ".idea", ".vscode"
+)
+
+# Glob patterns matched against both the member path and its base name
+DEFAULT_SKIP_PATTERNS = ("._*", ".DS_Store", "*.pyc", "*.pyo", "*.so", "*.dll", "*.egg-info/*")
+
+# Model weights and other serialized blobs
+WEIGHT_EXTENSIONS = (
+    ".bin", ".pt", ".pth", ".ckpt", ".safetensors", ".h5", ".hdf5", ".onnx", ".pb",
+    ".pkl", ".pickle", ".joblib", ".npy", ".npz", ".tflite", ".gguf", ".ggml", ".msgpack"
+)
+
+
+class MemberFilter:
+    """Decide from central directory metadata alone which members to skip.
+
+    Nothing is decompressed: only names, declared sizes and compression ratios are used.
+    Python sources are never skipped for size, since large files are chunked across
+    prompts; other text files are capped at max_text_bytes and binaries at max_member_bytes.
+    """
+
+    def __init__(
+        self,
+        skip_directories: Iterable[str] = DEFAULT_SKIP_DIRECTORIES,
+        skip_patterns: Iterable[str] = DEFAULT_SKIP_PATTERNS,
+        max_member_bytes: int = 1024 * 1024,
+        max_text_bytes: int = 1024 * 1024,
+        max_compression_ratio: float = 100.0
+    ):
+        self.skip_directories = set(skip_directories)
+        self.skip_patterns = tuple(skip_patterns)
+        self.max_member_bytes = max_member_bytes
+        self.max_text_bytes = max_text_bytes
+        self.max_compression_ratio = max_compression_ratio
+
+    def skip_reason(self, info: zipfile.ZipInfo) -> Optional[str]:
+        """Return why a member should be skipped, or None to analyze it."""
+        path = info.filename
+        parts = path.split("/")
+        for directory in parts[:-1]:
+            if directory in self.skip_directories:
+                return f"excluded directory '{directory}/'"
+
+        name = parts[-1]
+        for pattern in self.skip_patterns:
+            if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern):
+                return f"matches excluded pattern '{pattern}'"
+
+        if os.path.splitext(name)[1].lower() in WEIGHT_EXTENSIONS:
+            return "model weights or serialized data"
+
+        mime_type, _ = mimetypes.guess_type(name)
+        is_text = mime_type is not None and mime_type.startswith("text/")
+        if is_text and mime_type != "text/x-python" and info.file_size > self.max_text_bytes:
+            return f"text file larger than {self.max_text_bytes} bytes"
+        if not is_text and info.file_size > self.max_member_bytes:
+            return f"larger than {self.max_member_bytes} bytes"
+
+        if info.compress_size and info.file_size / info.compress_size > self.max_compression_ratio:
+            return f"compression ratio above {self.max_compression_ratio:g}"
+
+        return None
+
+
+def skipped_result(info: zipfile.ZipInfo, reason: str) -> Dict:
+    """files_analyzed entry for a member dropped by the pre-filter."""
+    return {
+        "file_name": os.path.basename(info.filename),
+        "file_type": "skipped",
+        "file_size": f"{info.file_size} bytes",
+        "content": f"Skipped: {reason}",
+        "ai_analysis": ""
+    }
@@ -0,0 +1,109 @@
+import zipfile
+import zlib
+from typing import BinaryIO, Dict
+
+# What zipfile raises for a member whose data does not match its headers
+CORRUPT_MEMBER_ERRORS = (zipfile.BadZipFile, EOFError, zlib.error)
+
+
+class ArchiveRejected(Exception):
+    """Raised when an archive exceeds the configured resource limits."""
+
+
+class ArchiveLimits:
+    def __init__(
+        self,
+        max_members: int = 10000,
+        max_total_bytes: int = 1024 * 1024 * 1024,
+        max_compression_ratio: float = 200.0,
+        max_path_depth: int = 32,
+        min_ratio_check_bytes: int = 1024 * 1024
+    ):
+        self.max_members = max_members
+        self.max_total_bytes = max_total_bytes
+        # Applies to the whole archive and to each member expanding past min_ratio_check_bytes
+        self.max_compression_ratio = max_compression_ratio
+        self.max_path_depth = max_path_depth
+        self.min_ratio_check_bytes = min_ratio_check_bytes
+
+
+def check_archive(zip_ref: zipfile.ZipFile, limits: ArchiveLimits) -> None:
+    """Inspect the central directory and raise ArchiveRejected before any decompression."""
+    infos = zip_ref.infolist()
+    if len(infos) > limits.max_members:
+        raise ArchiveRejected(f"Archive has {len(infos)} members, limit is {limits.max_members}")
+
+    total_size = 0
+    total_compressed = 0
+    for info in infos:
+        path = info.filename
+        if path.startswith("/") or ".." in path.split("/"):
+            raise ArchiveRejected(f"Unsafe member path: {path}")
+        depth = path.rstrip("/").count("/") + 1
+        if depth > limits.max_path_depth:
+            raise ArchiveRejected(f"Member path deeper than {limits.max_path_depth} levels: {path}")
+        # A bomb member could otherwise hide behind incompressible padding in the aggregate ratio
+        if (
+            info.file_size > limits.min_ratio_check_bytes
+            and info.file_size > limits.max_compression_ratio * max(info.compress_size, 1)
+        ):
+            raise ArchiveRejected(
+                f"Member {path} compression ratio {info.file_size / max(info.compress_size, 1):.0f} "
+                f"exceeds {limits.max_compression_ratio:g}"
+            )
+        total_size += info.file_size
+        total_compressed += info.compress_size
+
+    if total_size > limits.max_total_bytes:
+        raise ArchiveRejected(
+            f"Archive expands to {total_size} bytes, limit is {limits.max_total_bytes}"
+        )
+    if total_compressed and total_size / total_compressed > limits.max_compression_ratio:
+        raise ArchiveRejected(
+            f"Archive compression ratio {total_size / total_compressed:.0f} exceeds {limits.max_compression_ratio:g}"
+        )
+
+
+class GuardedReader:
+    """Wrap a member stream so corrupt data aborts the whole archive, not just one file.
+
+    zipfile never returns more than a member's declared size, so a member whose
+    central directory understates its size, or whose data was tampered with,
+    shows up as a CRC or decompression error; those become ArchiveRejected.
+    """
+
+    def __init__(self, stream: BinaryIO, name: str):
+        self.stream = stream
+        self.name = name
+
+    def read(self, size: int = -1) -> bytes:
+        try:
+            return self.stream.read(size)
+        except CORRUPT_MEMBER_ERRORS as e:
+            raise ArchiveRejected(f"Member {self.name} is corrupt: {e}")
+
+    def close(self) -> None:
+        self.stream.close()
+
+    def __enter__(self) -> "GuardedReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_guarded(zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo) -> GuardedReader:
+    try:
+        stream = zip_ref.open(info)
+    except CORRUPT_MEMBER_ERRORS as e:
+        raise ArchiveRejected(f"Member {info.filename} is corrupt: {e}")
+    return GuardedReader(stream, info.filename)
+
+
+def rejected_result(reason: str) -> Dict:
+    return {
+        "isValid": False,
+        "message": f"Archive rejected: {reason}",
+        "files_analyzed": [],
+        "ai_analysis": None
+    }